@@ -0,0 +1,418 @@
+"""
+Offline replay benchmark for the ASL session pipeline.
+
+Replays a recorded frame sequence (a directory of images or a video file)
+through LettersSessionState / GesturesSessionState and, optionally, through
+the full /ws endpoint via an in-process TestClient - no webcam or browser.
+
+Frames are resized like the web client (320 px wide) and JPEG-encoded once,
+so the session run and the /ws run see exactly the same bytes and both
+include imdecode.
+
+With --trace, a landmark trace (landmark_trace.py) is replayed into the
+sessions' process_landmarks instead - features and predict_proba only, no
+decode or MediaPipe - optionally --repeat times to profile millions of
+frames. --record-trace writes such a trace while replaying frames.
+
+Reports per run: frames/sec, p50/p95/p99 per-frame latency, per-frame
+allocation high-water mark (tracemalloc, separate pass), and agreement of
+the displayed top label / probabilities with a saved baseline.
+
+Examples (from backend/):
+
+    python benchmarks/replay_benchmark.py --video clip.mp4 --save-baseline base.npz
+    # ... change asl_sessions.py ...
+    python benchmarks/replay_benchmark.py --video clip.mp4 --baseline base.npz --ws
+
+    python benchmarks/replay_benchmark.py --video clip.mp4 --model letters --record-trace traces/
+    python benchmarks/replay_benchmark.py --trace traces/letters-....npy --model letters --repeat 1000
+"""
+
+import argparse
+import json
+import os
+import queue
+import sys
+import threading
+import tracemalloc
+from time import perf_counter
+from typing import Any, Dict, Iterator, List, Optional
+
+import cv2
+import numpy as np
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(BACKEND_DIR, "services"))
+
+from asl_sessions import SESSION_CLASSES, create_session
+from frame_executor import decode_and_process
+from frame_protocol import build_binary_message
+from landmark_trace import TraceRecorder, load_trace, replay_trace
+from model_loader import load_models
+
+IMAGE_EXTS = (".jpg", ".jpeg", ".png", ".bmp", ".webp")
+WS_PINNED_FPS = 100000.0     # rate governor limits during --ws runs
+WS_REPLY_TIMEOUT_S = 5.0
+
+
+def models_config(model_dir: str) -> Dict[str, Dict[str, Any]]:
+    """Same model files main.py serves"""
+    return {
+        "letters": {
+            "path": os.path.join(model_dir, "model_rf_336.p"),
+            "description": "ASL alphabet and numbers recognition",
+            "labels_path": None,
+        },
+        "gestures": {
+            "path": os.path.join(model_dir, "model_rf_336_phrases.p"),
+            "description": "ASL gestures and phrases recognition",
+            "labels_path": os.path.join(model_dir, "label_names.json"),
+        },
+    }
+
+
+# ========================================
+# Input
+# ========================================
+
+def load_frames(source: str, width: int = 320, limit: Optional[int] = None) -> List[np.ndarray]:
+    """BGR frames from an image directory (sorted by name) or a video file"""
+    frames = []
+    if os.path.isdir(source):
+        names = sorted(n for n in os.listdir(source) if n.lower().endswith(IMAGE_EXTS))
+        for name in names[:limit]:
+            img = cv2.imread(os.path.join(source, name))
+            if img is not None:
+                frames.append(img)
+    else:
+        cap = cv2.VideoCapture(source)
+        while limit is None or len(frames) < limit:
+            ok, img = cap.read()
+            if not ok:
+                break
+            frames.append(img)
+        cap.release()
+    if not frames:
+        raise SystemExit(f"No frames found in {source}")
+
+    if width:
+        h, w = frames[0].shape[:2]
+        size = (width, round(h * width / w))
+        frames = [cv2.resize(f, size, interpolation=cv2.INTER_AREA) for f in frames]
+    return frames
+
+
+def encode_frames(frames: List[np.ndarray], quality: int) -> List[bytes]:
+    out = []
+    for f in frames:
+        ok, buf = cv2.imencode(".jpg", f, [cv2.IMWRITE_JPEG_QUALITY, quality])
+        out.append(buf.tobytes())
+    return out
+
+
+# ========================================
+# Runs
+# ========================================
+
+class RunResult:
+    def __init__(self, name: str, labels: List[str]):
+        self.name = name
+        self.labels = labels
+        self.latencies: List[float] = []
+        self.tops: List[str] = []               # "" when nothing is displayed
+        self.probs: List[Optional[np.ndarray]] = []
+        self.wall = 0.0
+        self.predicted = 0     # frames that ran predict_proba
+        self.reused = 0        # frames that reused the last output (ASL_PREDICT_REUSE_EPS)
+        self.missing = 0       # /ws frames that got no reply in time
+
+    def add(self, latency: float, display: Optional[np.ndarray], timings: Optional[Dict[str, float]] = None):
+        self.latencies.append(latency)
+        self.probs.append(display)
+        self.tops.append(self.labels[int(np.argmax(display))] if display is not None else "")
+        if timings:
+            self.predicted += "predict_proba" in timings
+            self.reused += "predict_reused" in timings
+
+    def add_missing(self):
+        """A frame without a reply: shows nothing, keeps later frames aligned with the baseline"""
+        self.missing += 1
+        self.probs.append(None)
+        self.tops.append("")
+
+
+def run_session(model: str, mode: str, payloads: List[bytes], loaded_models,
+                trace_dir: Optional[str] = None) -> RunResult:
+    """decode_and_process on the session class directly, one frame after another"""
+    state = create_session(model, mode=mode, loaded_models=loaded_models)
+    if trace_dir:
+        os.makedirs(trace_dir, exist_ok=True)
+        state.trace = TraceRecorder(os.path.join(trace_dir, f"{model}.npy"))
+    res = RunResult(f"{model}/session", loaded_models[model]["label_names"])
+    try:
+        start = perf_counter()
+        for payload in payloads:
+            t0 = perf_counter()
+            decode_and_process(state, payload)
+            res.add(perf_counter() - t0, state.smoothed_proba(), state.last_timings)
+        res.wall = perf_counter() - start
+    finally:
+        state.close()
+    return res
+
+
+def run_trace(model: str, mode: str, trace: np.ndarray, repeat: int, loaded_models) -> RunResult:
+    """replay_trace into process_landmarks, `repeat` passes over the trace in one session"""
+    state = create_session(model, mode=mode, loaded_models=loaded_models)
+    res = RunResult(f"{model}/trace", loaded_models[model]["label_names"])
+    try:
+        start = perf_counter()
+        for _ in range(repeat):
+            frames = replay_trace(state, trace)
+            while True:
+                t0 = perf_counter()
+                if next(frames, None) is None:
+                    break
+                res.add(perf_counter() - t0, state.smoothed_proba(), state.last_timings)
+        res.wall = perf_counter() - start
+    finally:
+        state.close()
+    return res
+
+
+class ReplyReader:
+    """Reads /ws replies on a background thread so each one can be waited for with a timeout"""
+
+    def __init__(self, ws):
+        self._replies: "queue.Queue[Optional[Dict[str, Any]]]" = queue.Queue()
+        self._thread = threading.Thread(target=self._read, args=(ws,), name="ws-replies", daemon=True)
+        self._thread.start()
+
+    def _read(self, ws):
+        try:
+            while True:
+                self._replies.put(ws.receive_json())
+        except Exception:
+            self._replies.put(None)    # closed
+
+    def discard_late(self) -> int:
+        """Drop replies that came in after their frame timed out; returns how many"""
+        late = 0
+        while True:
+            try:
+                self._replies.get_nowait()
+            except queue.Empty:
+                return late
+            late += 1
+
+    def next(self, timeout: float) -> Optional[Dict[str, Any]]:
+        """The next reply, or None if nothing arrives within `timeout` seconds"""
+        try:
+            return self._replies.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+def run_ws(model: str, mode: str, payloads: List[bytes], model_dir: str,
+           timeout: float = WS_REPLY_TIMEOUT_S) -> RunResult:
+    """Send every frame through /ws (binary protocol) and wait for its reply
+
+    The server loads its models from `model_dir`, like the session runs.
+    Frames the server drops or can't decode get no reply; they're counted as
+    missing after `timeout` seconds instead of blocking the run.
+    """
+    from fastapi.testclient import TestClient
+    import main
+    import rate_governor
+
+    for name, config in models_config(model_dir).items():
+        main.MODELS[name].update(config)
+
+    # Pin target_fps far above anything we reach so the rate governor never
+    # drops back-to-back frames
+    limits = rate_governor.MIN_FPS, rate_governor.MAX_FPS
+    rate_governor.MIN_FPS = rate_governor.MAX_FPS = WS_PINNED_FPS
+
+    res = RunResult(f"{model}/ws", main.LOADED_MODELS[model]["label_names"])
+    client = TestClient(main.app)
+    try:
+        with client.websocket_connect(f"/ws?model={model}&mode={mode}") as ws:
+            ws.receive_json()  # hello
+            replies = ReplyReader(ws)
+            start = perf_counter()
+            for payload in payloads:
+                # Anything already waiting answers an earlier, timed-out frame
+                replies.discard_late()
+                t0 = perf_counter()
+                ws.send_bytes(build_binary_message(payload))
+                reply = replies.next(timeout)
+                latency = perf_counter() - t0
+                if reply is None:
+                    res.add_missing()
+                    continue
+                display = None
+                if reply.get("top") is not None:
+                    # Replies only carry the top label; keep its confidence in its slot
+                    display = np.zeros(len(res.labels))
+                    display[res.labels.index(reply["top"])] = reply["conf"]
+                res.add(latency, display)
+            res.wall = perf_counter() - start
+    finally:
+        rate_governor.MIN_FPS, rate_governor.MAX_FPS = limits
+    return res
+
+
+def measure_allocations(state, frames: Iterator) -> Dict[str, float]:
+    """Per-frame allocation high-water mark and net growth, traced with tracemalloc
+
+    `frames` processes one frame on `state` per next() (a generator over the input).
+    """
+    peaks = []
+    try:
+        tracemalloc.start()
+        base = tracemalloc.get_traced_memory()[0]
+        while True:
+            before = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            if next(frames, StopIteration) is StopIteration:
+                break
+            peaks.append(tracemalloc.get_traced_memory()[1] - before)
+        growth = tracemalloc.get_traced_memory()[0] - base
+    finally:
+        tracemalloc.stop()
+        state.close()
+    return {
+        "alloc_peak_kib_p50": float(np.percentile(peaks, 50)) / 1024,
+        "alloc_peak_kib_max": float(np.max(peaks)) / 1024,
+        "alloc_net_growth_kib": growth / 1024,
+    }
+
+
+# ========================================
+# Reporting
+# ========================================
+
+def summarize(res: RunResult) -> Dict[str, float]:
+    lat_ms = np.asarray(res.latencies) * 1000.0
+    summary = {
+        "frames": len(lat_ms),
+        "fps": len(lat_ms) / res.wall if res.wall > 0 else float("nan"),
+        "p50_ms": float(np.percentile(lat_ms, 50)),
+        "p95_ms": float(np.percentile(lat_ms, 95)),
+        "p99_ms": float(np.percentile(lat_ms, 99)),
+    }
+    if res.name.endswith("/ws"):
+        summary["missing_replies"] = res.missing
+    if res.predicted + res.reused:
+        # Share of predictions served from the session's last output
+        summary["predict_reused"] = res.reused / (res.predicted + res.reused)
+    return summary
+
+
+def compare(res: RunResult, tops: np.ndarray, probs: Optional[np.ndarray]) -> Dict[str, float]:
+    """Agreement of displayed top labels (and probabilities, when both have them)"""
+    n = min(len(tops), len(res.tops))
+    if n == 0:
+        return {}
+    out = {"top_agreement": float(np.mean(np.asarray(res.tops[:n]) == tops[:n]))}
+    if probs is not None and not res.name.endswith("/ws"):
+        diffs = [
+            float(np.abs(p - b).max())
+            for p, b in zip(res.probs[:n], probs[:n])
+            if p is not None and not np.isnan(b).any()
+        ]
+        out["max_abs_prob_diff"] = max(diffs) if diffs else 0.0
+    return out
+
+
+def baseline_arrays(res: RunResult) -> Dict[str, np.ndarray]:
+    probs = np.full((len(res.probs), len(res.labels)), np.nan)
+    for i, p in enumerate(res.probs):
+        if p is not None:
+            probs[i] = p
+    model = res.name.split("/")[0]
+    return {f"{model}_tops": np.asarray(res.tops, dtype=str), f"{model}_probs": probs}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    src = parser.add_mutually_exclusive_group(required=True)
+    src.add_argument("--frames", help="directory of frame images, replayed in name order")
+    src.add_argument("--video", help="video file to replay")
+    src.add_argument("--trace", help="landmark trace (.npy) to replay past MediaPipe")
+    parser.add_argument("--model", choices=list(SESSION_CLASSES) + ["all"], default="all")
+    parser.add_argument("--mode", default="auto", help="letters model mode (auto/letters/numbers)")
+    parser.add_argument("--limit", type=int, default=None, help="replay at most this many frames")
+    parser.add_argument("--width", type=int, default=320, help="resize width (0 keeps the source size)")
+    parser.add_argument("--jpeg-quality", type=int, default=60)
+    parser.add_argument("--model-dir", default=os.path.join(BACKEND_DIR, "model"))
+    parser.add_argument("--ws", action="store_true", help="also replay through /ws with a TestClient")
+    parser.add_argument("--ws-timeout", type=float, default=WS_REPLY_TIMEOUT_S,
+                        help="seconds to wait for each /ws reply before counting it missing")
+    parser.add_argument("--repeat", type=int, default=1, help="passes over a --trace")
+    parser.add_argument("--record-trace", metavar="DIR", help="record a landmark trace per model while replaying frames")
+    parser.add_argument("--alloc-frames", type=int, default=200,
+                        help="frames for the tracemalloc pass (0 skips it)")
+    parser.add_argument("--baseline", help="npz from --save-baseline to compare predictions against")
+    parser.add_argument("--save-baseline", help="write this run's session predictions to an npz")
+    parser.add_argument("--json", help="also write the report to this file")
+    args = parser.parse_args(argv)
+
+    if args.trace:
+        trace = load_trace(args.trace)[:args.limit]
+        print(f"Replaying {len(trace)} trace records x {args.repeat}")
+    else:
+        frames = load_frames(args.frames or args.video, width=args.width, limit=args.limit)
+        payloads = encode_frames(frames, args.jpeg_quality)
+        print(f"Replaying {len(payloads)} frames ({frames[0].shape[1]}x{frames[0].shape[0]})")
+
+    loaded_models = load_models(models_config(args.model_dir))
+    models = list(SESSION_CLASSES) if args.model == "all" else [args.model]
+    baseline = np.load(args.baseline) if args.baseline else None
+
+    report: Dict[str, Dict[str, float]] = {}
+    to_save: Dict[str, np.ndarray] = {}
+    for model in models:
+        if model not in loaded_models:
+            print(f"✗ Skipping '{model}': model not loaded")
+            continue
+
+        if args.trace:
+            runs = [run_trace(model, args.mode, trace, args.repeat, loaded_models)]
+        else:
+            runs = [run_session(model, args.mode, payloads, loaded_models, trace_dir=args.record_trace)]
+            if args.ws:
+                runs.append(run_ws(model, args.mode, payloads, args.model_dir, timeout=args.ws_timeout))
+        to_save.update(baseline_arrays(runs[0]))
+
+        for res in runs:
+            row = summarize(res)
+            if baseline is not None and f"{model}_tops" in baseline.files:
+                row.update(compare(res, baseline[f"{model}_tops"], baseline[f"{model}_probs"]))
+            elif res is not runs[0]:
+                row.update(compare(res, np.asarray(runs[0].tops), None))
+            report[res.name] = row
+
+        if args.alloc_frames:
+            state = create_session(model, mode=args.mode, loaded_models=loaded_models)
+            if args.trace:
+                frames_iter = replay_trace(state, trace[:args.alloc_frames])
+            else:
+                frames_iter = (decode_and_process(state, p) for p in payloads[:args.alloc_frames])
+            report[runs[0].name].update(measure_allocations(state, frames_iter))
+
+    for name, row in report.items():
+        print(f"\n{name}")
+        for key, value in row.items():
+            print(f"  {key:<22} {value:.4g}" if isinstance(value, float) else f"  {key:<22} {value}")
+
+    if args.save_baseline:
+        np.savez(args.save_baseline, **to_save)
+        print(f"\n✓ Baseline saved to {args.save_baseline}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,9 +2,13 @@ import cv2
 import mediapipe as mp
 import numpy as np
 import pickle
-from collections import deque
 from time import time
 import os
+import sys
+
+# Shared with the server sessions in backend/services
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "services"))
+from ring_buffer import RingBuffer
 
 # ========== CONFIG ==========
 # Get the absolute directory of this file (backend/model/)
@@ -278,8 +282,8 @@ def main():
         cv2.namedWindow(WIN_NAME, cv2.WINDOW_NORMAL)
 
         # Buffers
-        feat84_buffer = deque(maxlen=max(SEQ_WINDOW, SMOOTH_K))
-        proba_buffer = deque(maxlen=8)
+        feat84_buffer = RingBuffer(max(SEQ_WINDOW, SMOOTH_K), 84)
+        proba_buffer = RingBuffer(8, dtype=np.float64)
 
         # Stability
         stable_idx = None
@@ -330,13 +334,13 @@ def main():
 
                 if n_features == 84:
                     if len(feat84_buffer) >= SMOOTH_K:
-                        X = np.mean(np.stack(list(feat84_buffer)[-SMOOTH_K:]), axis=0).reshape(1, -1)
+                        X = feat84_buffer.window()[-SMOOTH_K:].mean(axis=0).reshape(1, -1)
                         if hasattr(model, 'predict_proba'):
                             pred_proba = model.predict_proba(X)[0]
 
                 elif n_features == 336:
                     if len(feat84_buffer) >= MIN_SEQ_FOR_PRED:
-                        seq = np.stack(list(feat84_buffer)[-SEQ_WINDOW:], axis=0)
+                        seq = feat84_buffer.window()[-SEQ_WINDOW:]
                         motion_level = window_motion_level(seq)
 
                         if motion_level < MOTION_THRESHOLD:
@@ -370,7 +374,7 @@ def main():
             # Smooth display probs
             proba_display = None
             if proba_buffer:
-                proba_display = np.mean(np.stack(proba_buffer, axis=0), axis=0)
+                proba_display = proba_buffer.window().mean(axis=0)
 
             # Stable locking for big label
             now = time()
@@ -2,11 +2,15 @@ import cv2
 import mediapipe as mp
 import numpy as np
 import pickle
-from collections import deque
 from time import time
 from pathlib import Path
 import json
 import os
+import sys
+
+# Shared with the server sessions in backend/services
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "services"))
+from ring_buffer import RingBuffer
 
 # ========== CONFIG (accuracy-first) ==========
 MODEL_PATH = 'model_rf_336_phrases.p'
@@ -197,8 +201,8 @@ def main():
         cv2.namedWindow(WIN_NAME, cv2.WINDOW_NORMAL)
 
         # Buffers
-        feat84_buffer = deque(maxlen=SEQ_WINDOW)
-        proba_buffer = deque(maxlen=8)
+        feat84_buffer = RingBuffer(SEQ_WINDOW, 84)
+        proba_buffer = RingBuffer(8, dtype=np.float64)
 
         # Stability
         stable_idx = None
@@ -247,7 +251,7 @@ def main():
 
             # Predict every PREDICT_STRIDE frames, once we have enough history
             if len(feat84_buffer) >= MIN_SEQ_FOR_PRED and (frame_count % PREDICT_STRIDE == 0):
-                seq = np.stack(list(feat84_buffer)[-SEQ_WINDOW:], axis=0)
+                seq = feat84_buffer.window()[-SEQ_WINDOW:]
                 X336 = to_336_from_seq(seq).reshape(1, -1)
 
                 if hasattr(model, 'predict_proba'):
@@ -264,7 +268,7 @@ def main():
             # Smooth display probs
             proba_display = None
             if proba_buffer:
-                proba_display = np.mean(np.stack(proba_buffer, axis=0), axis=0)
+                proba_display = proba_buffer.window().mean(axis=0)
 
             # Stable locking
             now = time()
@@ -1,3 +1,4 @@
+import asyncio
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 from firebase_admin import firestore
@@ -22,82 +23,79 @@ def _get_iso_week_year(date_obj):
     """Return (ISO year, ISO week number)"""
     return date_obj.isocalendar()[:2]
 
-def _update_user_activity_stats(user_id: str):
-    """
-    Update daily streak and weekly lesson counts.
-    Call this AFTER a successful lesson save.
+def _week_counts(value) -> list:
+    """A stored weeklyThis / weeklyLast array, or 7 zeros if it's missing or malformed"""
+    if (isinstance(value, (list, tuple)) and len(value) == 7
+            and all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in value)):
+        return list(value)
+    return [0] * 7
+
+def _activity_stats_update(data: dict, now: datetime) -> dict:
     """
-    try:
-        user_ref = firestore_client.collection('users').document(user_id)
-        user_doc = user_ref.get()
-        
-        if not user_doc.exists:
-            return
+    Daily streak and weekly lesson counts after one more lesson at `now`,
+    as a users/{uid} update computed from the user doc's current `data`.
 
-        data = user_doc.to_dict()
-        # Use local time, not UTC, to match user's wall clock
-        now = datetime.now()
-        today = now.date()
-        
-        # --- STREAK LOGIC ---
-        current_streak = data.get('dailyStreak', 0)
-        last_update_ts = data.get('lastStreakUpdate')
-        
-        # Determine if we need to update streak
-        if isinstance(last_update_ts, datetime):
-            # Check local date of last update
-            last_date = last_update_ts.date()
-        else:
-            last_date = None
+    Runs inside the lesson save transaction, so missing or malformed fields
+    are treated as unset instead of failing the submission.
+    """
+    today = now.date()
+    
+    # --- STREAK LOGIC ---
+    current_streak = data.get('dailyStreak', 0)
+    if not isinstance(current_streak, int) or isinstance(current_streak, bool) or current_streak < 0:
+        current_streak = 0
+    last_update_ts = data.get('lastStreakUpdate')
+    
+    # Determine if we need to update streak
+    if isinstance(last_update_ts, datetime):
+        # Check local date of last update
+        last_date = last_update_ts.date()
+    else:
+        last_date = None
 
-        new_streak = current_streak
-        
-        if last_date == today:
-            # Already played today, keep streak
-            pass
-        elif last_date == today - timedelta(days=1):
-            # Played yesterday, increment streak
-            new_streak += 1
-        else:
-            # Missed a day (or first time), reset to 1
-            new_streak = 1
-            
-        # --- WEEKLY STATS LOGIC ---
-        weekly_this = data.get('weeklyThis', [0] * 7)
-        weekly_last = data.get('weeklyLast', [0] * 7)
-        last_week_info = data.get('lastWeekInfo') # Store (year, week) to track resets
-        
-        current_year_week = _get_iso_week_year(today) # (2023, 45)
-        
-        # Check if we moved to a new week
-        if last_week_info and tuple(last_week_info) != current_year_week:
-            # Shift data
-            weekly_last = weekly_this
-            weekly_this = [0] * 7
-            
-        # Increment today's count 
-        # Python weekday(): 0=Mon, ... 6=Sun
-        # Frontend Chart:   0=Sun, 1=Mon ... 6=Sat
-        # Mapping: (py_day + 1) % 7
-        py_day = today.weekday()
-        chart_day_idx = (py_day + 1) % 7
-        
-        weekly_this[chart_day_idx] += 1
-            
-        # --- SAVE UPDATES ---
-        update_payload = {
-            'dailyStreak': new_streak,
-            'lastStreakUpdate': now,
-            'weeklyThis': weekly_this,
-            'weeklyLast': weekly_last,
-            'lastWeekInfo': current_year_week
-        }
-        
-        user_ref.update(update_payload)
-        print(f"Stats updated for {user_id}: Streak={new_streak}, ChartIdx={chart_day_idx} (Day {py_day})")
-        
-    except Exception as e:
-        print(f"Error updating user activity stats: {e}") 
+    new_streak = current_streak
+    
+    if last_date == today:
+        # Already played today, keep streak
+        pass
+    elif last_date == today - timedelta(days=1):
+        # Played yesterday, increment streak
+        new_streak += 1
+    else:
+        # Missed a day (or first time), reset to 1
+        new_streak = 1
+        
+    # --- WEEKLY STATS LOGIC ---
+    weekly_this = _week_counts(data.get('weeklyThis'))
+    weekly_last = _week_counts(data.get('weeklyLast'))
+    last_week_info = data.get('lastWeekInfo') # Store (year, week) to track resets
+    if not isinstance(last_week_info, (list, tuple)):
+        last_week_info = None
+    
+    current_year_week = _get_iso_week_year(today) # (2023, 45)
+    
+    # Check if we moved to a new week
+    if last_week_info and tuple(last_week_info) != current_year_week:
+        # Shift data
+        weekly_last = weekly_this
+        weekly_this = [0] * 7
+        
+    # Increment today's count 
+    # Python weekday(): 0=Mon, ... 6=Sun
+    # Frontend Chart:   0=Sun, 1=Mon ... 6=Sat
+    # Mapping: (py_day + 1) % 7
+    py_day = today.weekday()
+    chart_day_idx = (py_day + 1) % 7
+    
+    weekly_this[chart_day_idx] += 1
+        
+    return {
+        'dailyStreak': new_streak,
+        'lastStreakUpdate': now,
+        'weeklyThis': weekly_this,
+        'weeklyLast': weekly_last,
+        'lastWeekInfo': current_year_week
+    }
 
 class LessonAttempt(BaseModel):
     lesson_id: str
@@ -126,118 +124,135 @@ async def save_lesson_progress(attempt: LessonAttempt):
         session.require_authentication()
         user_id = session.get_current_uid()
         
-        # Get lesson to check passing_accuracy requirement
-        lesson_doc = firestore_client.collection('lessons').document(attempt.lesson_id).get()
-        if not lesson_doc.exists:
-            raise HTTPException(status_code=404, detail="Lesson not found")
-        
-        lesson_data = lesson_doc.to_dict()
-        passing_accuracy = lesson_data.get('passing_accuracy', 75)
-        gained_xp_amount = lesson_data.get('gained_XP', 10)
-        
-        # Determine pass/fail
-        passed = attempt.score >= passing_accuracy
-        understanding = calculate_understanding_level(attempt.score)
-        
-        # Check if progress record exists
-        progress_ref = firestore_client.collection('userProgress')\
-            .where('userId', '==', user_id)\
-            .where('lessonId', '==', attempt.lesson_id)\
-            .limit(1).stream()
-        
-        existing_progress = list(progress_ref)
-        
-        if existing_progress:
-            # Update existing progress
-            doc = existing_progress[0]
-            doc_ref = firestore_client.collection('userProgress').document(doc.id)
-            current_data = doc.to_dict()
-            
-            attempts = current_data.get('attempts', 0) + 1
-            best_score = max(current_data.get('bestScore', 0), attempt.score)
-            best_accuracy = max(current_data.get('bestAccuracy', 0), attempt.accuracy)
-            
-            # Only mark as completed if they've passed at least once
-            ever_passed = current_data.get('isCompleted', False) or passed
-            
-            doc_ref.update({
-                'attempts': attempts,
-                'bestScore': best_score,
-                'bestAccuracy': best_accuracy,
-                'lastScore': attempt.score,
-                'lastAccuracy': attempt.accuracy,
-                'lastAttemptDate': firestore.SERVER_TIMESTAMP,
-                'isCompleted': ever_passed,
-                'passed': passed,
-                'understandingLevel': understanding,
-                'status': 'completed' if ever_passed else 'in_progress',
-                'xpEarned': gained_xp_amount if ever_passed else 0
-            })
-        else:
-            # Create new progress record
-            firestore_client.collection('userProgress').add({
-                'userId': user_id,
-                'lessonId': attempt.lesson_id,
-                'attempts': 1,
-                'bestScore': attempt.score,
-                'bestAccuracy': attempt.accuracy,
-                'lastScore': attempt.score,
-                'lastAccuracy': attempt.accuracy,
-                'isCompleted': passed,
-                'passed': passed,
-                'understandingLevel': understanding,
-                'status': 'completed' if passed else 'in_progress',
-                'firstAttemptDate': firestore.SERVER_TIMESTAMP,
-                'lastAttemptDate': firestore.SERVER_TIMESTAMP,
-                'xpEarned': gained_xp_amount if passed else 0
-            })
-        
-        response_data = {
-            "message": "Progress saved successfully",
-            "score": attempt.score,
-            "passed": passed,
-            "understandingLevel": understanding,
-            "requiredScore": passing_accuracy,
-            "totalXP": _calculate_and_update_total_xp(user_id)
-        }
-        
-        # Fire-and-forget stats update (could be async background task, but calling directly for now)
-        _update_user_activity_stats(user_id)
-        
-        return response_data
+        # One transaction for the whole submission; its round trips block,
+        # so it runs on the default executor instead of the event loop
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            None, _save_lesson_attempt, firestore_client.transaction(), user_id, attempt
+        )
         
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to save progress: {str(e)}")
 
-def _calculate_and_update_total_xp(user_id: str) -> int:
+@firestore.transactional
+def _save_lesson_attempt(transaction, user_id: str, attempt: LessonAttempt) -> dict:
     """
-    Calculate total XP from all completed lessons and update the user's profile.
-    Returns the new total XP.
+    Everything a lesson submission changes, committed once: reads the user
+    and lesson docs (one batched read) and the progress record, then writes
+    the progress record and a single users/{uid} update with the XP delta,
+    streak and weekly stats. Returns the API response.
     """
-    try:
-        # Sum up xpEarned from all progress records
-        progress_ref = firestore_client.collection('userProgress')\
-            .where('userId', '==', user_id)\
-            .stream()
-            
-        total_xp = 0
-        for doc in progress_ref:
-            data = doc.to_dict()
-            # Use get() with default 0 in case field is missing
-            total_xp += data.get('xpEarned', 0)
-            
-        # Update user document
-        firestore_client.collection('users').document(user_id).update({
-            'xp': total_xp
+    progress_col = firestore_client.collection('userProgress')
+    user_ref = firestore_client.collection('users').document(user_id)
+    lesson_ref = firestore_client.collection('lessons').document(attempt.lesson_id)
+    
+    # Transactions need every read before the first write
+    docs = {doc.reference.path: doc for doc in firestore_client.get_all([user_ref, lesson_ref], transaction=transaction)}
+    user_doc, lesson_doc = docs[user_ref.path], docs[lesson_ref.path]
+    if not lesson_doc.exists:
+        raise HTTPException(status_code=404, detail="Lesson not found")
+    
+    # Get lesson to check passing_accuracy requirement
+    lesson_data = lesson_doc.to_dict()
+    passing_accuracy = lesson_data.get('passing_accuracy', 75)
+    gained_xp_amount = lesson_data.get('gained_XP', 10)
+    
+    # Determine pass/fail
+    passed = attempt.score >= passing_accuracy
+    understanding = calculate_understanding_level(attempt.score)
+    
+    # Check if progress record exists
+    existing_progress = list(transaction.get(
+        progress_col.where('userId', '==', user_id)
+                    .where('lessonId', '==', attempt.lesson_id)
+                    .limit(1)
+    ))
+    
+    user_data = user_doc.to_dict() if user_doc.exists else None
+    summed_xp = None
+    if user_data is not None and 'xp' not in user_data:
+        # User predates the xp counter - sum it once, then it's kept incrementally
+        summed_xp = sum(
+            doc.to_dict().get('xpEarned', 0)
+            for doc in transaction.get(progress_col.where('userId', '==', user_id))
+        )
+    
+    if existing_progress:
+        # Update existing progress
+        doc = existing_progress[0]
+        current_data = doc.to_dict()
+        previous_xp = current_data.get('xpEarned', 0)
+        
+        attempts = current_data.get('attempts', 0) + 1
+        best_score = max(current_data.get('bestScore', 0), attempt.score)
+        best_accuracy = max(current_data.get('bestAccuracy', 0), attempt.accuracy)
+        
+        # Only mark as completed if they've passed at least once
+        ever_passed = current_data.get('isCompleted', False) or passed
+        xp_earned = gained_xp_amount if ever_passed else 0
+        
+        transaction.update(doc.reference, {
+            'attempts': attempts,
+            'bestScore': best_score,
+            'bestAccuracy': best_accuracy,
+            'lastScore': attempt.score,
+            'lastAccuracy': attempt.accuracy,
+            'lastAttemptDate': firestore.SERVER_TIMESTAMP,
+            'isCompleted': ever_passed,
+            'passed': passed,
+            'understandingLevel': understanding,
+            'status': 'completed' if ever_passed else 'in_progress',
+            'xpEarned': xp_earned
         })
-        
-        return total_xp
-    except Exception as e:
-        print(f"Error syncing XP for user {user_id}: {e}")
-        # Return 0 or current count if failed, but don't crash the request
-        return 0
+    else:
+        # Create new progress record
+        previous_xp = 0
+        xp_earned = gained_xp_amount if passed else 0
+        transaction.set(progress_col.document(), {
+            'userId': user_id,
+            'lessonId': attempt.lesson_id,
+            'attempts': 1,
+            'bestScore': attempt.score,
+            'bestAccuracy': attempt.accuracy,
+            'lastScore': attempt.score,
+            'lastAccuracy': attempt.accuracy,
+            'isCompleted': passed,
+            'passed': passed,
+            'understandingLevel': understanding,
+            'status': 'completed' if passed else 'in_progress',
+            'firstAttemptDate': firestore.SERVER_TIMESTAMP,
+            'lastAttemptDate': firestore.SERVER_TIMESTAMP,
+            'xpEarned': xp_earned
+        })
+    
+    total_xp = 0
+    if user_data is not None:
+        # XP delta plus streak / weekly stats in one users update
+        # (use local time, not UTC, to match user's wall clock)
+        stored_xp = user_data.get('xp') or 0
+        if not isinstance(stored_xp, (int, float)) or isinstance(stored_xp, bool):
+            stored_xp = 0
+        base_xp = int(stored_xp) if summed_xp is None else summed_xp
+        total_xp = base_xp + (xp_earned - previous_xp)
+        try:
+            user_update = _activity_stats_update(user_data, datetime.now())
+        except Exception as e:
+            # Stats are secondary - don't lose the attempt over them
+            print(f"Error updating user activity stats: {e}")
+            user_update = {}
+        user_update['xp'] = total_xp
+        transaction.update(user_ref, user_update)
+    
+    return {
+        "message": "Progress saved successfully",
+        "score": attempt.score,
+        "passed": passed,
+        "understandingLevel": understanding,
+        "requiredScore": passing_accuracy,
+        "totalXP": total_xp
+    }
     
 @progress_router.get("/api/user/progress")
 async def get_user_progress():
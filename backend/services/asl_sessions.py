@@ -1,12 +1,27 @@
-import cv2
+import os
 import numpy as np
-from collections import deque
-from typing import Tuple, Optional, Dict, Any
-from mediapipe.solutions import hands as mp_hands
+from time import perf_counter
+from typing import Tuple, Optional, Dict, Any, List
+from hands_pool import HANDS_POOL
+from landmark_trace import open_session_trace
+from landmarks import N_LANDMARKS, handedness_from_results, landmarks_from_results
+from roi_tracker import HandRoiTracker, roi_enabled, run_hands
+from rolling_stats import RollingMean, RollingWindowStats
+from target_scores import TargetSet
 
 # ============================================================================
 # LETTERS/NUMBERS SESSION - Matches training in inference_live.py (Document 4)
 # ============================================================================
+#
+# Learners mostly hold one static handshape, and the forest gives the same
+# answer for (nearly) the same window. While motion stays under
+# MOTION_THRESHOLD and the 336-D features are within an L2 distance of
+# ASL_PREDICT_REUSE_EPS (default 0.02, "0" disables) of the window the
+# last predict_proba ran on, that output is reused instead ("predict_reused"
+# stage in metrics.py). Comparing against that window rather than the
+# previous frame keeps slow drift from adding up.
+
+PREDICT_REUSE_EPS = float(os.environ.get("ASL_PREDICT_REUSE_EPS", "0.02"))
 
 class LettersSessionState:
     """Letters/Numbers model - matches training feature extraction exactly"""
@@ -44,84 +59,120 @@ class LettersSessionState:
         self.target = None # Target class to constrain prediction to
         self.loaded_models = loaded_models or {}
         self.hands = self._init_hands()
-        self.feat84_buffer = deque(maxlen=max(self.SEQ_WINDOW, self.SMOOTH_K))
-        self.proba_buffer = deque(maxlen=8)
+        self.roi_tracker = HandRoiTracker() if roi_enabled() else None
+        self.last_timings: Dict[str, float] = {}  # per-stage seconds for the last frame (metrics.py)
+        self.trace = open_session_trace(self.model_name)  # landmark_trace.py, None unless ASL_TRACE_DIR
+        self.model_info = None    # pinned by get_model_info, moved on by _follow_model_reload
+        self.reload_pending = 0   # frames since a newer model version showed up
+        self.feat84_buffer = RollingWindowStats(self.SEQ_WINDOW, 84)
+        self.proba_buffer = RollingMean(8)  # width = n_classes, set on first append
+        self.target_set = TargetSet(self.proba_buffer.capacity, self.get_confidence_threshold, self.STABLE_N)
+        self.reuse_X336 = None     # window the last predict_proba ran on
+        self.reuse_proba = None    # and its raw output (before gating / masking)
+        self.predict_calls = 0
+        self.predict_reused = 0
         self.stable_idx = None
         self.stable_run = 0
         self.last_ts = 0.0
     
+    # Letters-specific MediaPipe configuration - optimized for speed
+    HANDS_CONFIG = dict(
+        static_image_mode=False,
+        max_num_hands=2,
+        model_complexity=1,  # Restoring complexity for accuracy
+        min_detection_confidence=0.6,
+        min_tracking_confidence=0.6
+    )
+    
     def _init_hands(self):
-        """Letters-specific MediaPipe configuration - optimized for speed"""
-        return mp_hands.Hands(
-            static_image_mode=False,
-            max_num_hands=2,
-            model_complexity=1,  # Restoring complexity for accuracy
-            min_detection_confidence=0.6,
-            min_tracking_confidence=0.6
-        )
+        """A Hands graph for HANDS_CONFIG, reused from an earlier session when possible"""
+        return HANDS_POOL.acquire(self.HANDS_CONFIG)
     
     def get_model_info(self):
-        if self.model_name not in self.loaded_models:
-            raise RuntimeError(f"Model '{self.model_name}' not loaded")
-        return self.loaded_models[self.model_name]
+        """The model version this session uses (the current one when it started)"""
+        if self.model_info is None:
+            info = self.loaded_models.get(self.model_name)
+            if info is None:
+                raise RuntimeError(f"Model '{self.model_name}' not loaded")
+            self.model_info = info
+        return self.model_info
+
+    def _follow_model_reload(self):
+        """Move to a reloaded model once the current feature window is done (model_registry.py)"""
+        latest = self.loaded_models.get(self.model_name)
+        if latest is None or latest is self.model_info or self.model_info is None:
+            self.reload_pending = 0
+            return
+        self.reload_pending += 1
+        if len(self.feat84_buffer) == 0 or self.reload_pending > self.SEQ_WINDOW:
+            # Don't smooth over predictions from two different models
+            self.model_info = latest
+            self.reload_pending = 0
+            self.proba_buffer.clear()
+            self.target_set.clear()
+            self.reuse_proba = None
+            self.stable_idx = None
+            self.stable_run = 0
     
     def set_mode(self, mode: str):
         if mode in ("auto", "letters", "numbers"):
             self.mode = mode
             self.feat84_buffer.clear()
             self.proba_buffer.clear()
+            self.target_set.clear()
 
     def set_target(self, target: Optional[str]):
         """Set a specific target to look for, suppressing all others"""
         self.target = target
         # clear buffers to avoid mixing old broad predictions with new constrained ones
         self.proba_buffer.clear()
+
+    def set_targets(self, targets: Optional[List[str]]):
+        """Score several candidate targets side by side (target_scores.py); None clears them"""
+        self.target_set.set(targets)
+
+    def target_results(self) -> List[Dict[str, Any]]:
+        return self.target_set.results()
     
-    def _order_hands(self, results):
-        """Letters-specific hand ordering"""
-        if not getattr(results, 'multi_hand_landmarks', None):
-            return []
-        hands_list = []
-        if getattr(results, "multi_handedness", None):
-            for handed, hl in zip(results.multi_handedness, results.multi_hand_landmarks):
-                label = handed.classification[0].label
-                conf = handed.classification[0].score
-                hands_list.append((label, hl, conf))
+    def _detect_hands(self, frame: np.ndarray):
+        """MediaPipe on the tracked hand ROI (or the full frame): (landmarks, labels, scores)"""
+        if self.roi_tracker is not None:
+            return self.roi_tracker.detect(self.hands, frame, self.last_timings)
+        return run_hands(self.hands, frame, self.last_timings)
+    
+    def _order_hands(self, landmarks: np.ndarray, scores: Optional[np.ndarray] = None):
+        """Letters-specific hand ordering: left-most (by mean x) first, at most 2 hands"""
+        if scores is not None:
+            n = min(len(landmarks), len(scores))
+            landmarks, confs = landmarks[:n], scores[:n]
         else:
-            for hl in results.multi_hand_landmarks:
-                mean_x = sum(lm.x for lm in hl.landmark) / 21.0
-                label = "Left" if mean_x < 0.5 else "Right"
-                hands_list.append((label, hl, 1.0))
-        
-        def sort_key(item):
-            _, hl, _ = item
-            mean_x = sum(lm.x for lm in hl.landmark) / 21.0
-            return mean_x
-        
-        hands_list.sort(key=sort_key)
-        return hands_list[:2]
+            confs = np.ones(len(landmarks), dtype=np.float64)
+        if len(landmarks) > 1:
+            order = np.argsort(landmarks[:, :, 0].sum(axis=1), kind="stable")[:2]
+            landmarks, confs = landmarks[order], confs[order]
+        return landmarks, confs
     
     def _feat84_from_results(self, results):
         """Letters-specific feature extraction: min-normalized (as originally trained)"""
-        hlists = self._order_hands(results)
-        if not hlists:
+        labels, scores = handedness_from_results(results)
+        return self._feat84_from_landmarks(landmarks_from_results(results), labels, scores)
+
+    def _feat84_from_landmarks(self, landmarks: Optional[np.ndarray], labels: Optional[List[str]] = None,
+                               scores: Optional[np.ndarray] = None):
+        """_feat84_from_results on a (hands, 21, 3) landmark array plus handedness"""
+        if landmarks is None or len(landmarks) == 0:
+            return None, 0.0
+        hands, confs = self._order_hands(landmarks, scores)
+        if len(hands) == 0:
             return None, 0.0
         
-        hand_conf = float(np.mean([conf for _, _, conf in hlists]))
-        xs = [lm.x for _, hl, _ in hlists for lm in hl.landmark]
-        ys = [lm.y for _, hl, _ in hlists for lm in hl.landmark]
-        min_x, min_y = min(xs), min(ys)
+        hand_conf = float(confs.mean())
+        xy = hands[:, :, :2]
         
-        feat = []
-        for slot in range(2):
-            if slot < len(hlists):
-                _, hl, _ = hlists[slot]
-                for lm in hl.landmark:
-                    feat.extend([lm.x - min_x, lm.y - min_y])
-            else:
-                feat.extend([0.0] * 42)
-        
-        return np.asarray(feat, dtype=np.float32), hand_conf
+        # Slot 0 = left-most hand, slot 1 = the other one (zeros if absent)
+        feat = np.zeros((2, N_LANDMARKS, 2), dtype=np.float32)
+        np.subtract(xy, xy.min(axis=(0, 1)), out=feat[:len(hands)])
+        return feat.reshape(-1), hand_conf
     
     def _to_336_from_seq(self, seq_Tx84):
         """Letters-specific 336D construction - Matches lesson_single_letter.py"""
@@ -148,6 +199,15 @@ class LettersSessionState:
             mad = np.zeros_like(mu)
             
         return np.concatenate([mu, sd, last_first, mad], axis=0).astype(np.float32)
+
+    def _to_336_from_stats(self, stats: RollingWindowStats):
+        """Same features as _to_336_from_seq, read from the running window sums"""
+        return np.concatenate([
+            stats.mean(),
+            stats.std(),
+            stats.last_minus_first(),
+            stats.mean_abs_diff(),
+        ], axis=0).astype(np.float32)
     
     def _window_motion_level(self, seq_Tx84):
         """Calculate motion level for J/Z gating"""
@@ -156,6 +216,15 @@ class LettersSessionState:
         diffs = np.abs(np.diff(seq_Tx84, axis=0))
         return float(diffs.mean())
     
+    def _reusable_proba(self, X336: np.ndarray, motion_level: float) -> Optional[np.ndarray]:
+        """The last raw predict_proba output if the hand has held still since, else None"""
+        if self.reuse_proba is None or motion_level >= self.MOTION_THRESHOLD:
+            return None
+        d = (X336 - self.reuse_X336).ravel()
+        if d.dot(d) >= PREDICT_REUSE_EPS * PREDICT_REUSE_EPS:
+            return None
+        return self.reuse_proba
+
     def _get_allowed_names(self):
         """Get allowed class names based on mode"""
         if self.mode == "letters":
@@ -200,16 +269,27 @@ class LettersSessionState:
     
     def process_frame(self, frame: np.ndarray) -> Tuple[Optional[np.ndarray], Optional[float], float]:
         """Process frame with letters-specific logic"""
+        self.last_timings = {}
+        
+        # MediaPipe on the hand ROI when tracking, else the full frame
+        landmarks, labels, scores = self._detect_hands(frame)
+        if self.trace is not None:
+            self.trace.record(landmarks, labels, scores)
+        return self.process_landmarks(landmarks, labels, scores)
+
+    def process_landmarks(self, landmarks: Optional[np.ndarray], labels: Optional[List[str]] = None,
+                          scores: Optional[np.ndarray] = None) -> Tuple[Optional[np.ndarray], Optional[float], float]:
+        """Everything process_frame does after hand detection (also used to replay traces)"""
+        self._follow_model_reload()
         model_info = self.get_model_info()
         current_model = model_info["model"]
         current_labels = model_info["label_names"]
         current_n_features = model_info["n_features"]
+        timings = self.last_timings
         
-        # Process frame directly
-        rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        results = self.hands.process(rgb)
-        
-        feat84, hand_confidence = self._feat84_from_results(results)
+        t0 = perf_counter()
+        feat84, hand_confidence = self._feat84_from_landmarks(landmarks, labels, scores)
+        timings["features"] = perf_counter() - t0
         pred_proba = None
         motion_level = None
         
@@ -219,18 +299,33 @@ class LettersSessionState:
             if hand_confidence < 0.6:
                 self.feat84_buffer.clear()
                 self.proba_buffer.clear()
+                self.target_set.clear()
                 return None, 0.0, 0.0
 
             self.feat84_buffer.append(feat84)
             
             if current_n_features == 336 and len(self.feat84_buffer) >= self.MIN_SEQ_FOR_PRED:
-                seq = np.stack(list(self.feat84_buffer)[-self.SEQ_WINDOW:], axis=0)
-                motion_level = self._window_motion_level(seq)
+                # Same as _window_motion_level / _to_336_from_seq on the stacked
+                # window, without re-stacking and reducing it every frame
+                t0 = perf_counter()
+                motion_level = float(self.feat84_buffer.mean_abs_diff().mean())
                 
-                X336 = self._to_336_from_seq(seq).reshape(1, -1)
+                X336 = self._to_336_from_stats(self.feat84_buffer).reshape(1, -1)
+                timings["features"] += perf_counter() - t0
                 
                 if hasattr(current_model, "predict_proba"):
-                    pred_proba = current_model.predict_proba(X336)[0]
+                    t0 = perf_counter()
+                    raw_proba = self._reusable_proba(X336, motion_level)
+                    if raw_proba is not None:
+                        self.predict_reused += 1
+                        timings["predict_reused"] = perf_counter() - t0
+                    else:
+                        raw_proba = current_model.predict_proba(X336)[0]
+                        self.predict_calls += 1
+                        self.reuse_X336, self.reuse_proba = X336, raw_proba
+                        timings["predict_proba"] = perf_counter() - t0
+                    # Gating and masking below work in place on a copy
+                    pred_proba = raw_proba.copy()
                     
                     # Gate J/Z without motion
                     # Logic: 
@@ -241,6 +336,8 @@ class LettersSessionState:
                     should_gate = True
                     if self.target and self.target.upper() in self.MOTION_ONLY_CLASSES:
                         should_gate = False
+                    if not self.MOTION_ONLY_CLASSES.isdisjoint(self.target_set.names):
+                        should_gate = False
                         
                     if should_gate and motion_level < self.MOTION_THRESHOLD:
                         for i, name in enumerate(current_labels):
@@ -250,17 +347,31 @@ class LettersSessionState:
                         if s > 0:
                             pred_proba /= s
                     
+                    # Every target of a target set scores off the same vector
+                    self.target_set.update(pred_proba, current_labels)
+                    
                     # Apply mode filtering
                     pred_proba = self._mask_probs(pred_proba, current_labels)
                     self.proba_buffer.append(pred_proba)
         else:
             self.feat84_buffer.clear()
             self.proba_buffer.clear()  # Clear predictions when hand is lost
+            self.target_set.clear()
         
         return pred_proba, motion_level, hand_confidence
     
+    def smoothed_proba(self) -> Optional[np.ndarray]:
+        """Average of the recent predictions shown to the user (None if empty)"""
+        if not self.proba_buffer:
+            return None
+        return self.proba_buffer.mean()
+
     def close(self):
-        self.hands.close()
+        if self.hands is not None:
+            HANDS_POOL.release(self.hands, self.HANDS_CONFIG)
+            self.hands = None
+        if self.trace is not None:
+            self.trace.close()
 
     def get_confidence_threshold(self, class_name: str) -> float:
         """Get confidence threshold for specific class"""
@@ -293,8 +404,14 @@ class GesturesSessionState:
         self.loaded_models = loaded_models or {}
         self.target = None # Target class
         self.hands = self._init_hands()
-        self.feat84_buffer = deque(maxlen=self.SEQ_WINDOW)
-        self.proba_buffer = deque(maxlen=4)  # Reduced from 6 for faster state clearing
+        self.roi_tracker = HandRoiTracker() if roi_enabled() else None
+        self.last_timings: Dict[str, float] = {}  # per-stage seconds for the last frame (metrics.py)
+        self.trace = open_session_trace(self.model_name)  # landmark_trace.py, None unless ASL_TRACE_DIR
+        self.model_info = None    # pinned by get_model_info, moved on by _follow_model_reload
+        self.reload_pending = 0   # frames since a newer model version showed up
+        self.feat84_buffer = RollingWindowStats(self.SEQ_WINDOW, 84)
+        self.proba_buffer = RollingMean(4)  # Reduced from 6 for faster state clearing
+        self.target_set = TargetSet(self.proba_buffer.capacity, self.get_confidence_threshold, self.STABLE_N)
         self.stable_idx = None
         self.stable_run = 0
         self.last_ts = 0.0
@@ -308,56 +425,87 @@ class GesturesSessionState:
         """Set a specific target to look for"""
         self.target = target
         self.proba_buffer.clear()
+
+    def set_targets(self, targets: Optional[List[str]]):
+        """Score several candidate targets side by side (target_scores.py); None clears them"""
+        self.target_set.set(targets)
+
+    def target_results(self) -> List[Dict[str, Any]]:
+        return self.target_set.results()
+    
+    # Gestures-specific MediaPipe configuration - maximum speed
+    HANDS_CONFIG = dict(
+        static_image_mode=False,
+        max_num_hands=2,
+        model_complexity=0,  # Lightweight model
+        min_detection_confidence=0.4,  # Lower for speed
+        min_tracking_confidence=0.4  # Lower for speed
+    )
     
     def _init_hands(self):
-        """Gestures-specific MediaPipe configuration - maximum speed"""
-        return mp_hands.Hands(
-            static_image_mode=False,
-            max_num_hands=2,
-            model_complexity=0,  # Lightweight model
-            min_detection_confidence=0.4,  # Lower for speed
-            min_tracking_confidence=0.4  # Lower for speed
-        )
+        """A Hands graph for HANDS_CONFIG, reused from an earlier session when possible"""
+        return HANDS_POOL.acquire(self.HANDS_CONFIG)
     
     def get_model_info(self):
-        if self.model_name not in self.loaded_models:
-            raise RuntimeError(f"Model '{self.model_name}' not loaded")
-        return self.loaded_models[self.model_name]
+        """The model version this session uses (the current one when it started)"""
+        if self.model_info is None:
+            info = self.loaded_models.get(self.model_name)
+            if info is None:
+                raise RuntimeError(f"Model '{self.model_name}' not loaded")
+            self.model_info = info
+        return self.model_info
+
+    def _follow_model_reload(self):
+        """Move to a reloaded model once the current feature window is done (model_registry.py)"""
+        latest = self.loaded_models.get(self.model_name)
+        if latest is None or latest is self.model_info or self.model_info is None:
+            self.reload_pending = 0
+            return
+        self.reload_pending += 1
+        if len(self.feat84_buffer) == 0 or self.reload_pending > self.SEQ_WINDOW:
+            # Don't smooth over predictions from two different models
+            self.model_info = latest
+            self.reload_pending = 0
+            self.proba_buffer.clear()
+            self.stable_idx = None
+            self.stable_run = 0
+    
+    def _detect_hands(self, frame: np.ndarray):
+        """MediaPipe on the tracked hand ROI (or the full frame): (landmarks, labels, scores)"""
+        if self.roi_tracker is not None:
+            return self.roi_tracker.detect(self.hands, frame, self.last_timings)
+        return run_hands(self.hands, frame, self.last_timings)
     
     def _hand_landmarks_xy(self, results):
         """Gestures-specific feature extraction: wrist-centered, palm-scaled"""
-        left = None
-        right = None
-        
-        if results.multi_hand_landmarks and results.multi_handedness:
-            for lm, hd in zip(results.multi_hand_landmarks, results.multi_handedness):
-                label = hd.classification[0].label.lower()
-                xy = np.array([(pt.x, pt.y) for pt in lm.landmark], dtype=np.float32)
-                
-                # Wrist-center normalization
-                wrist = xy[0]
-                xy -= wrist
-                
-                # Palm-scale normalization
-                palm = np.linalg.norm(xy[9]) + 1e-6  # wrist to middle MCP
-                xy /= palm
-                
-                if label == "left":
-                    left = xy
-                else:
-                    right = xy
-        
-        def pack(xy):
-            return xy.reshape(-1) if xy is not None else np.zeros(42, dtype=np.float32)
-        
-        left_vec = pack(left)
-        right_vec = pack(right)
-        feat84 = np.concatenate([left_vec, right_vec], axis=0)
+        landmarks = None
+        labels, scores = handedness_from_results(results)
+        if labels is not None:
+            landmarks = landmarks_from_results(results)
+        return self._feat84_from_landmarks(landmarks, labels, scores)
+
+    def _feat84_from_landmarks(self, landmarks: Optional[np.ndarray], labels: Optional[List[str]] = None,
+                               scores: Optional[np.ndarray] = None):
+        """_hand_landmarks_xy on a (hands, 21, 3) landmark array plus handedness (scores unused)"""
+        # Slot 0 = left hand, slot 1 = right hand (zeros if absent)
+        feat84 = np.zeros((2, N_LANDMARKS, 2), dtype=np.float32)
+        hand_conf = 0.0
         
-        # Hand confidence
-        hand_conf = 1.0 if (left is not None or right is not None) else 0.0
+        if landmarks is not None and labels:
+            xy = landmarks[:, :, :2].astype(np.float32)
+            
+            # Wrist-center normalization
+            xy -= xy[:, :1]
+            
+            for h, label in zip(range(len(xy)), labels):
+                # Palm-scale normalization (wrist to middle MCP). Same ops as
+                # np.linalg.norm, kept per hand so the scalar rounding matches training.
+                mcp = xy[h, 9]
+                slot = 0 if label.lower() == "left" else 1
+                np.divide(xy[h], np.sqrt(mcp.dot(mcp)) + 1e-6, out=feat84[slot])
+                hand_conf = 1.0
         
-        return feat84, hand_conf
+        return feat84.reshape(-1), hand_conf
     
     def _to_336_from_seq(self, seq_Tx84):
         """Gestures-specific 336D construction"""
@@ -368,23 +516,50 @@ class GesturesSessionState:
         dmu = dM.mean(axis=0)
         dsd = dM.std(axis=0) + 1e-6
         return np.concatenate([mu, sd, dmu, dsd], axis=0).astype(np.float32)
+
+    def _to_336_from_stats(self, stats: RollingWindowStats):
+        """Same features as _to_336_from_seq, read from the running window sums"""
+        return np.concatenate([
+            stats.mean(),
+            stats.std() + 1e-6,
+            stats.diff_mean(),
+            stats.diff_std() + 1e-6,
+        ], axis=0).astype(np.float32)
     
     def process_frame(self, frame: np.ndarray) -> Tuple[Optional[np.ndarray], Optional[float], float]:
         """Process frame with gestures-specific logic - OPTIMIZED"""
+        self.last_timings = {}
+        
+        # OPTIMIZATION: Skip MediaPipe processing on some frames
+        # Use cached features to maintain buffer continuity
+        detected = self.detects_frame()
+        landmarks = labels = scores = None
+        if detected:
+            # Actually process this frame (hand ROI when tracking, else full frame)
+            landmarks, labels, scores = self._detect_hands(frame)
+        if self.trace is not None:
+            self.trace.record(landmarks, labels, scores, detected=detected)
+        return self.process_landmarks(landmarks, labels, scores, detected=detected)
+
+    def detects_frame(self) -> bool:
+        """Count a frame; False for the ones FRAME_PROCESS_SKIP skips hand detection on"""
+        self.frame_count += 1
+        return self.frame_count % self.FRAME_PROCESS_SKIP == 0
+
+    def process_landmarks(self, landmarks: Optional[np.ndarray], labels: Optional[List[str]] = None,
+                          scores: Optional[np.ndarray] = None, detected: bool = True
+                          ) -> Tuple[Optional[np.ndarray], Optional[float], float]:
+        """Everything process_frame does after hand detection (detected=False: MediaPipe was skipped)"""
+        self._follow_model_reload()
         model_info = self.get_model_info()
         current_model = model_info["model"]
         current_n_features = model_info["n_features"]
+        timings = self.last_timings
         
-        self.frame_count += 1
-        
-        # OPTIMIZATION: Skip MediaPipe processing on some frames
-        # Use cached features to maintain buffer continuity
-        if self.frame_count % self.FRAME_PROCESS_SKIP == 0:
-            # Actually process this frame
-            rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            results = self.hands.process(rgb)
-            
-            feat84, hand_confidence = self._hand_landmarks_xy(results)
+        if detected:
+            t0 = perf_counter()
+            feat84, hand_confidence = self._feat84_from_landmarks(landmarks, labels, scores)
+            timings["features"] = perf_counter() - t0
             
             if feat84 is not None and np.any(feat84 != 0):
                 self.lost_hand_count = 0 # Reset counter
@@ -401,6 +576,7 @@ class GesturesSessionState:
                 else:
                     self.feat84_buffer.clear()
                     self.proba_buffer.clear() # Fix: Clear predictions immediately when hand is lost
+                    self.target_set.clear()
                     self.last_feat84 = None
                     feat84 = None
                     hand_confidence = 0.0
@@ -423,14 +599,19 @@ class GesturesSessionState:
         if (len(self.feat84_buffer) >= self.MIN_SEQ_FOR_PRED and 
             self.process_count % self.PREDICT_STRIDE == 0):
             
-            seq = np.stack(list(self.feat84_buffer)[-self.SEQ_WINDOW:], axis=0)
-            
             if current_n_features == 336:
-                X336 = self._to_336_from_seq(seq).reshape(1, -1)
+                t0 = perf_counter()
+                X336 = self._to_336_from_stats(self.feat84_buffer).reshape(1, -1)
+                timings["features"] = timings.get("features", 0.0) + (perf_counter() - t0)
                 
                 if hasattr(current_model, "predict_proba"):
+                    t0 = perf_counter()
                     pred_proba = current_model.predict_proba(X336)[0]
+                    timings["predict_proba"] = perf_counter() - t0
                     
+                    # Every target of a target set scores off the same vector
+                    self.target_set.update(pred_proba, model_info["label_names"])
+
                     # Apply Target Filtering if set
                     if self.target:
                         model_info = self.get_model_info()
@@ -455,5 +636,33 @@ class GesturesSessionState:
         """Get confidence threshold for specific class"""
         return self.CLASS_THRESHOLDS.get(class_name, self.MIN_CONFIDENCE)
 
+    def smoothed_proba(self) -> Optional[np.ndarray]:
+        """Average of the recent predictions shown to the user (None if empty)"""
+        if not self.proba_buffer:
+            return None
+        return self.proba_buffer.mean()
+
     def close(self):
-        self.hands.close()
\ No newline at end of file
+        if self.hands is not None:
+            HANDS_POOL.release(self.hands, self.HANDS_CONFIG)
+            self.hands = None
+        if self.trace is not None:
+            self.trace.close()
+
+
+# ============================================================================
+# SESSION FACTORY
+# ============================================================================
+
+SESSION_CLASSES = {
+    "letters": LettersSessionState,
+    "gestures": GesturesSessionState,
+}
+
+def create_session(model: str, mode: str = "auto", loaded_models: Dict[str, Any] = None):
+    """Create the session state for a /ws connection (raises ValueError for unknown models)"""
+    if model == "letters":
+        return LettersSessionState(mode=mode, loaded_models=loaded_models)
+    if model == "gestures":
+        return GesturesSessionState(loaded_models=loaded_models)
+    raise ValueError(f"Invalid model: {model}")
@@ -0,0 +1,114 @@
+import threading
+from time import monotonic
+from typing import List, Optional
+
+import numpy as np
+
+# ============================================================================
+# BATCHED PREDICTOR - merges single-row predict_proba calls across sessions
+# ============================================================================
+#
+# Every session calls predict_proba on one 1x336 row per frame. For sklearn
+# forests the per-call overhead (validation, tree dispatch) dwarfs the per-row
+# cost, so with the thread executor we collect rows from all sessions for up
+# to `max_wait_ms`, run one predict_proba on the stacked matrix and hand each
+# caller its row back.
+#
+# close() stops the batching thread (model reload, shutdown); rows still
+# waiting are run first, and later calls go straight to the model.
+#
+#   ASL_BATCH_MAX_WAIT_MS  0 disables batching (default), e.g. 2-5 under load
+#   ASL_BATCH_MAX_SIZE     flush early once this many rows are waiting
+
+
+class _PendingRow:
+    __slots__ = ("row", "done", "result", "error")
+
+    def __init__(self, row: np.ndarray):
+        self.row = row
+        self.done = threading.Event()
+        self.result: Optional[np.ndarray] = None
+        self.error: Optional[BaseException] = None
+
+
+class BatchedPredictor:
+    """
+    Drop-in wrapper for a fitted classifier in LOADED_MODELS.
+
+    predict_proba blocks the calling worker thread until its batch has run,
+    so it only helps when several sessions predict concurrently (thread
+    executor). Everything else is forwarded to the wrapped model.
+    """
+
+    def __init__(self, model, max_wait_ms: float = 2.0, max_batch: int = 64):
+        self.model = model
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_batch = max_batch
+        self._pending: List[_PendingRow] = []
+        self._cond = threading.Condition()
+        self._thread = None
+        self._closed = False
+
+    def __getattr__(self, name):
+        # Only called for attributes not found on the wrapper (classes_, n_features_in_, ...)
+        return getattr(self.model, name)
+
+    def predict_proba(self, X) -> np.ndarray:
+        X = np.asarray(X)
+        if X.ndim != 2 or X.shape[0] != 1:
+            return self.model.predict_proba(X)
+
+        pending = _PendingRow(X[0])
+        with self._cond:
+            if self._closed:
+                return self.model.predict_proba(X)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="asl-batch-predict", daemon=True)
+                self._thread.start()
+            self._pending.append(pending)
+            self._cond.notify()
+
+        pending.done.wait()
+        if pending.error is not None:
+            raise pending.error
+        return pending.result
+
+    def _take_batch(self) -> List[_PendingRow]:
+        with self._cond:
+            while not self._pending:
+                if self._closed:
+                    return []
+                self._cond.wait()
+            deadline = monotonic() + self.max_wait
+            while len(self._pending) < self.max_batch and not self._closed:
+                remaining = deadline - monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            batch = self._pending[:self.max_batch]
+            del self._pending[:self.max_batch]
+            return batch
+
+    def close(self):
+        """Stop the batching thread once the rows already waiting have run"""
+        with self._cond:
+            self._closed = True
+            thread = self._thread
+            self._cond.notify_all()
+        if thread is not None and thread is not threading.current_thread():
+            thread.join()
+
+    def _run(self):
+        while True:
+            batch = self._take_batch()
+            if not batch:
+                return
+            try:
+                proba = self.model.predict_proba(np.stack([p.row for p in batch], axis=0))
+                for i, p in enumerate(batch):
+                    p.result = proba[i:i + 1]
+            except BaseException as e:
+                for p in batch:
+                    p.error = e
+            for p in batch:
+                p.done.set()
@@ -0,0 +1,211 @@
+import os
+import pickle
+import sys
+from typing import List, Optional
+
+import numpy as np
+
+# ============================================================================
+# COMPILED FOREST - flattened sklearn tree ensembles with vectorized traversal
+# ============================================================================
+#
+# Realtime feedback calls predict_proba on one 336-D row per frame. For a
+# pickled RandomForestClassifier most of that call is input validation and
+# joblib dispatch, not tree walking. CompiledForest copies every tree into
+# one set of contiguous node arrays:
+#
+#   feature[n], threshold[n]   split of node n (leaves: feature 0, +inf)
+#   children[2n], children[2n+1]
+#                              left / right child as global node ids
+#                              (leaves point at themselves)
+#   value[n, C]                per-tree class proportions at node n
+#   roots[t]                   root node of tree t
+#
+# and walks all trees for all rows at once, max_depth steps. Leaves loop
+# back to themselves, so rows that reach a leaf early just stay put.
+#
+# Results match sklearn exactly: inputs are compared as float32 (like sklearn's
+# trees), leaf values are the trees' stored class fractions, and trees are
+# summed in estimator order before dividing by the number of trees.
+#
+# Export a pickle once with
+#
+#   python forest_engine.py ../model/model_rf_336.p
+#
+# which writes model_rf_336.forest.npz next to it; model_loader picks that up
+# instead of unpickling sklearn.
+
+
+class CompiledForest:
+    """Drop-in predict_proba / predict for a fitted forest or decision tree classifier"""
+
+    def __init__(self, feature: np.ndarray, threshold: np.ndarray, children: np.ndarray,
+                 value: np.ndarray, roots: np.ndarray, max_depth: int, classes: np.ndarray,
+                 n_features_in: int, meta_classes: Optional[List[str]] = None):
+        self.feature = feature
+        self.threshold = threshold
+        self.children = children
+        self.value = value
+        self.roots = roots
+        self.max_depth = int(max_depth)
+        self.classes_ = classes
+        self.n_features_in_ = int(n_features_in)
+        self.n_classes_ = len(classes)
+        self.n_estimators = len(roots)
+        # Class names stored next to the model in the original pickle, if any
+        self.meta_classes = meta_classes
+
+    # ---- construction ----
+
+    @classmethod
+    def from_sklearn(cls, model, meta_classes: Optional[List[str]] = None) -> "CompiledForest":
+        """Flatten a fitted RandomForest / ExtraTrees / DecisionTree classifier"""
+        if getattr(model, "n_outputs_", 1) != 1:
+            raise ValueError("Only single-output classifiers can be compiled")
+        estimators = getattr(model, "estimators_", None)
+        if estimators is None:
+            estimators = [model]
+        classes = np.asarray(model.classes_)
+        n_classes = len(classes)
+
+        features, thresholds, children, values, roots = [], [], [], [], []
+        offset = 0
+        max_depth = 0
+        for est in estimators:
+            tree = getattr(est, "tree_", None)
+            if tree is None:
+                raise ValueError(f"Can't compile estimator of type {type(est).__name__}")
+            n = tree.node_count
+            ids = np.arange(n, dtype=np.intp)
+            leaf = tree.children_left == -1
+
+            feature = np.where(leaf, 0, tree.feature).astype(np.intp)
+            threshold = np.where(leaf, np.inf, tree.threshold).astype(np.float64)
+            left = np.where(leaf, ids, tree.children_left) + offset
+            right = np.where(leaf, ids, tree.children_right) + offset
+
+            # Classifier trees store class fractions per node (sklearn >= 1.4),
+            # which is exactly what DecisionTreeClassifier.predict_proba returns
+            value = np.array(tree.value[:, 0, :n_classes], dtype=np.float64)
+
+            features.append(feature)
+            thresholds.append(threshold)
+            children.append(np.stack([left, right], axis=1).reshape(-1))
+            values.append(value)
+            roots.append(offset)
+            offset += n
+            max_depth = max(max_depth, tree.max_depth)
+
+        return cls(
+            feature=np.concatenate(features),
+            threshold=np.concatenate(thresholds),
+            children=np.concatenate(children).astype(np.intp),
+            value=np.concatenate(values, axis=0),
+            roots=np.asarray(roots, dtype=np.intp),
+            max_depth=max_depth,
+            classes=classes,
+            n_features_in=model.n_features_in_,
+            meta_classes=meta_classes,
+        )
+
+    # ---- inference ----
+
+    def apply(self, X) -> np.ndarray:
+        """Global leaf id reached by each row in each tree, shape (rows, trees)"""
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        if X.shape[1] != self.n_features_in_:
+            raise ValueError(f"X has {X.shape[1]} features, but the model expects {self.n_features_in_}")
+
+        flat = X.ravel()
+        row_offset = (np.arange(X.shape[0], dtype=np.intp) * X.shape[1])[:, np.newaxis]
+        node = np.broadcast_to(self.roots, (X.shape[0], self.n_estimators))
+        for _ in range(self.max_depth):
+            go_right = flat[row_offset + self.feature[node]] > self.threshold[node]
+            node = self.children[2 * node + go_right]
+        return node
+
+    def predict_proba(self, X) -> np.ndarray:
+        leaves = self.apply(X)
+        # (trees, rows, C) summed along the tree axis adds tree by tree, like sklearn
+        proba = self.value[leaves.T].sum(axis=0)
+        proba /= self.n_estimators
+        return proba
+
+    def predict(self, X) -> np.ndarray:
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
+
+    # ---- export / load ----
+
+    def save(self, path: str):
+        arrays = dict(
+            feature=self.feature,
+            threshold=self.threshold,
+            children=self.children,
+            value=self.value,
+            roots=self.roots,
+            max_depth=np.asarray(self.max_depth),
+            classes=savable_classes(self.classes_),
+            n_features_in=np.asarray(self.n_features_in_),
+        )
+        if self.meta_classes is not None:
+            arrays["meta_classes"] = np.asarray(self.meta_classes, dtype=str)
+        with open(path, "wb") as f:
+            np.savez(f, **arrays)
+
+    @classmethod
+    def load(cls, path: str) -> "CompiledForest":
+        with np.load(path, allow_pickle=False) as z:
+            meta = z["meta_classes"].tolist() if "meta_classes" in z.files else None
+            return cls(
+                feature=z["feature"].astype(np.intp),
+                threshold=z["threshold"],
+                children=z["children"].astype(np.intp),
+                value=z["value"],
+                roots=z["roots"].astype(np.intp),
+                max_depth=int(z["max_depth"]),
+                classes=z["classes"],
+                n_features_in=int(z["n_features_in"]),
+                meta_classes=meta,
+            )
+
+
+def savable_classes(classes: np.ndarray) -> np.ndarray:
+    """classes_ as a plain (non-object) array, so it saves without pickling
+
+    sklearn keeps object dtype when fit on object / pandas string labels.
+    """
+    classes = np.asarray(classes)
+    if classes.dtype == object:
+        return classes.astype(str)
+    return classes
+
+
+def compiled_model_path(model_path: str) -> str:
+    """Where the exported arrays for a pickled model live (model.p -> model.forest.npz)"""
+    return os.path.splitext(model_path)[0] + ".forest.npz"
+
+
+def export_model(model_path: str, out_path: Optional[str] = None) -> str:
+    """Unpickle a model file (bare estimator or {"model": ..., "classes": ...}) and save it compiled"""
+    with open(model_path, "rb") as f:
+        obj = pickle.load(f)
+    model = obj.get("model", obj) if isinstance(obj, dict) else obj
+    meta_classes = obj.get("classes") if isinstance(obj, dict) else None
+    if isinstance(meta_classes, (list, tuple)) and len(meta_classes) > 0:
+        meta_classes = [str(c) for c in meta_classes]
+    else:
+        meta_classes = None
+
+    out_path = out_path or compiled_model_path(model_path)
+    CompiledForest.from_sklearn(model, meta_classes=meta_classes).save(out_path)
+    return out_path
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("usage: python forest_engine.py MODEL.p [MODEL.p ...]")
+        sys.exit(1)
+    for path in sys.argv[1:]:
+        print(f"✓ Exported {path} -> {export_model(path)}")
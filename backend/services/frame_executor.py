@@ -0,0 +1,241 @@
+import asyncio
+import base64
+import os
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter
+from typing import Any, Dict, List, Optional
+
+import cv2
+import numpy as np
+
+from asl_sessions import SESSION_CLASSES, create_session
+from frame_protocol import (FrameProtocolError, LandmarkPayload, decode_image, decode_landmarks,
+                            encode_landmarks)
+from hands_pool import HANDS_POOL
+
+# ============================================================================
+# FRAME EXECUTOR - keeps decode / MediaPipe / predict_proba off the event loop
+# ============================================================================
+#
+# cv2.imdecode, Hands.process and predict_proba are all blocking. Running them
+# inside the async handler stalls every other WebSocket on the same uvicorn
+# worker, so the /ws handler hands each frame to an executor instead.
+#
+#   ASL_EXECUTOR          "thread" (default), "process" or "inline" (old behaviour)
+#   ASL_EXECUTOR_WORKERS  pool size, defaults to the CPU count
+#
+# OpenCV and MediaPipe release the GIL while they work, so a thread pool is
+# enough to overlap sessions. "process" pins each session to a worker process
+# (see inference_workers.py) so throughput scales past one core.
+
+EXECUTOR_KINDS = ("inline", "thread", "process")
+
+
+def decode_and_process(state, payload):
+    """Decode a frame (raw bytes or base64 text), then run landmarks + classifier"""
+    if isinstance(payload, LandmarkPayload):
+        return process_client_landmarks(state, payload)
+    timings = {}
+    try:
+        if isinstance(payload, str):
+            t0 = perf_counter()
+            payload = base64.b64decode(payload)
+            timings["b64_decode"] = perf_counter() - t0
+        t0 = perf_counter()
+        frame = decode_image(payload)
+        timings["imdecode"] = perf_counter() - t0
+    except Exception:
+        frame = None
+    if frame is None:
+        state.last_timings = timings
+        return None
+    result = state.process_frame(frame)
+    # process_frame starts a fresh last_timings for its own stages
+    state.last_timings.update(timings)
+    return result
+
+
+def process_client_landmarks(state, payload: LandmarkPayload):
+    """Landmarks detected on the client, straight into the session's feature path"""
+    t0 = perf_counter()
+    try:
+        landmarks, labels, scores = decode_landmarks(payload.data)
+    except FrameProtocolError:
+        state.last_timings = {}
+        return None
+    state.last_timings = {"landmarks_decode": perf_counter() - t0}
+    detects_frame = getattr(state, "detects_frame", None)
+    if detects_frame is not None and not detects_frame():
+        # Gestures ignores the landmarks on the frames it would skip MediaPipe
+        # for, so its feature window is built the same way as from images
+        if state.trace is not None:
+            state.trace.record(None, None, None, detected=False)
+        return state.process_landmarks(None, None, None, detected=False)
+    if state.trace is not None:
+        state.trace.record(landmarks, labels, scores)
+    return state.process_landmarks(landmarks, labels, scores)
+
+
+def _create_local_session(model: str, mode: str, loaded_models):
+    state = create_session(model, mode=mode, loaded_models=loaded_models)
+    try:
+        state.get_model_info()
+    except BaseException:
+        state.close()
+        raise
+    return state
+
+
+def _warmup_landmarks(model: str) -> List[LandmarkPayload]:
+    """A still, open right hand for long enough that the session reaches predict_proba"""
+    cls = SESSION_CLASSES[model]
+    frames = (getattr(cls, "MIN_SEQ_FOR_PRED", 1) + getattr(cls, "PREDICT_STRIDE", 1)
+              + getattr(cls, "FRAME_PROCESS_SKIP", 1))
+    # Wrist near the bottom, five fingers of four joints fanning out above it
+    angles = np.linspace(-0.6, 0.6, 5)
+    joints = np.arange(1, 5) * 0.05
+    fingers = np.stack([np.sin(angles)[:, None] * joints, -np.cos(angles)[:, None] * joints], axis=-1)
+    xy = np.concatenate([[[0.5, 0.8]], (fingers.reshape(-1, 2) + [0.5, 0.75])])
+    hand = np.concatenate([xy, np.zeros((len(xy), 1))], axis=1)[None]
+    return [LandmarkPayload(encode_landmarks(hand, ["Right"]))] * frames
+
+
+class FrameExecutor:
+    """Shared pool that runs per-frame work for all sessions"""
+
+    def __init__(self, kind: str = "thread", max_workers: Optional[int] = None,
+                 models_config: Optional[Dict[str, Any]] = None):
+        if kind not in EXECUTOR_KINDS:
+            raise ValueError(f"Unknown executor kind: {kind} (expected one of {EXECUTOR_KINDS})")
+        self.kind = kind
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self._pool = None
+        self._workers = None
+        if kind == "thread":
+            self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="asl-frame")
+        elif kind == "process":
+            from inference_workers import ShardedWorkerPool
+            # Workers are spawned by start() or on the first session
+            self._workers = ShardedWorkerPool(models_config or {}, n_workers=self.max_workers)
+
+    @classmethod
+    def from_env(cls, models_config: Optional[Dict[str, Any]] = None) -> "FrameExecutor":
+        kind = os.environ.get("ASL_EXECUTOR", "thread").lower()
+        workers = os.environ.get("ASL_EXECUTOR_WORKERS")
+        return cls(kind=kind, max_workers=int(workers) if workers else None,
+                   models_config=models_config)
+
+    @property
+    def capacity(self) -> int:
+        """How many frames can be processed at the same time"""
+        return 1 if self.kind == "inline" else self.max_workers
+
+    async def open_session(self, model: str, mode: str, loaded_models: Dict[str, Any]):
+        """Create the state for a new /ws session
+
+        Raises ValueError for unknown models and RuntimeError if the model
+        doesn't load. Built off the event loop: the first session for a model
+        loads it, and one for a config the Hands pool has no idle graph for
+        builds one.
+        """
+        if self._workers is not None:
+            return await self._workers.open_session(model, mode, loaded_models)
+        return await asyncio.get_running_loop().run_in_executor(
+            None, _create_local_session, model, mode, loaded_models
+        )
+
+    def prewarm_hands(self):
+        """Build a Hands graph per session config in this process (workers build their own)"""
+        if self._workers is not None:
+            return
+        for session_cls in SESSION_CLASSES.values():
+            HANDS_POOL.prewarm(session_cls.HANDS_CONFIG)
+
+    def start(self):
+        """Spawn worker processes up front so the first learner doesn't wait on them"""
+        if self._workers is not None:
+            self._workers.start()
+
+    async def warmup(self, model: str, loaded_models: Dict[str, Any], frames: int = 3) -> float:
+        """Run frames through a throwaway session per worker process (one otherwise), returns seconds
+
+        Blank images warm decode and the Hands graph; they never show a hand,
+        so a synthetic landmark sequence follows to get predict_proba called
+        wherever the model actually lives (the worker, with ASL_EXECUTOR=process).
+        """
+        _, blank = cv2.imencode(".jpg", np.zeros((240, 320, 3), dtype=np.uint8))
+        payloads = [blank.tobytes()] * frames + _warmup_landmarks(model)
+        n_sessions = self._workers.n_workers if self._workers is not None else 1
+        t0 = perf_counter()
+        # Opened together, so the sharded pool puts one on each worker
+        opened = await asyncio.gather(*(self.open_session(model, "auto", loaded_models)
+                                        for _ in range(n_sessions)), return_exceptions=True)
+        states = [s for s in opened if not isinstance(s, BaseException)]
+        errors = [e for e in opened if isinstance(e, BaseException)]
+        try:
+            if errors:
+                raise errors[0]
+            await asyncio.gather(*(self._warm_session(state, payloads) for state in states))
+        finally:
+            for state in states:
+                state.close()
+        return perf_counter() - t0
+
+    async def _warm_session(self, state, payloads: List[Any]):
+        runner = self.session()
+        for payload in payloads:
+            await runner.process(state, payload)
+        await runner.drain()
+
+    @property
+    def fixed_class_count(self) -> bool:
+        """Sessions can't follow a reload that changes a model's class count (worker result slots)"""
+        return self._workers is not None
+
+    def reload(self, name: str):
+        """Pass a model reload on to the worker processes (threads share the API's registry)"""
+        if self._workers is not None:
+            self._workers.reload(name)
+
+    def session(self) -> "SessionRunner":
+        """Create a runner for one WebSocket session"""
+        return SessionRunner(self._pool)
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+        if self._workers is not None:
+            self._workers.shutdown()
+
+
+class SessionRunner:
+    """
+    Runs one session's frames one at a time and in order.
+
+    A slow session only ever occupies one worker, so it can't hold up frames
+    from other sessions.
+    """
+
+    def __init__(self, pool: Optional[ThreadPoolExecutor]):
+        self._pool = pool
+        self._lock = asyncio.Lock()
+        self._inflight: Optional[asyncio.Future] = None
+
+    async def process(self, state, payload):
+        """Returns process_frame's (pred_proba, motion, hand_conf), or None if undecodable"""
+        async with self._lock:
+            if hasattr(state, "process_payload"):
+                # Remote session: the worker process decodes and processes
+                self._inflight = asyncio.ensure_future(state.process_payload(payload))
+            elif self._pool is None:
+                return decode_and_process(state, payload)
+            else:
+                loop = asyncio.get_running_loop()
+                self._inflight = loop.run_in_executor(self._pool, decode_and_process, state, payload)
+            # Shield so a cancelled handler doesn't forget a job that is still running
+            return await asyncio.shield(self._inflight)
+
+    async def drain(self):
+        """Wait for any job still running (e.g. before closing the session)"""
+        if self._inflight is not None and not self._inflight.done():
+            await asyncio.wait([self._inflight])
@@ -0,0 +1,68 @@
+import asyncio
+from typing import Any, Dict, Optional, Tuple
+
+# ============================================================================
+# FRAME MAILBOX - latest-frame-wins handoff between receive and process
+# ============================================================================
+#
+# ws_endpoint used to receive, process and reply in one loop, so when
+# inference fell behind, frames piled up in the socket buffers and feedback
+# got later and later. Now a receiver task drops every message into this
+# one-slot mailbox and a processor task always takes the newest frame:
+#
+#   - a frame that hasn't been picked up yet is replaced (and counted as
+#     dropped), so at most one frame waits behind the one being processed
+#   - mode / target changes are never dropped - they're merged in arrival
+#     order and handed over with the next take, before its frame
+
+
+class FrameMailbox:
+    """One-slot mailbox for a single WebSocket session"""
+
+    def __init__(self):
+        self._payload = None
+        self._received_at = 0.0
+        self._controls: Dict[str, Any] = {}
+        self._event = asyncio.Event()
+        self._closed = False
+        self.received = 0    # frames put in
+        self.dropped = 0     # frames replaced before the processor got to them
+
+    def put(self, controls: Dict[str, Any], payload=None, received_at: float = 0.0) -> bool:
+        """Queue control changes and/or a frame; True if a waiting frame got replaced"""
+        if self._closed:
+            return False
+        replaced = False
+        if controls:
+            self._controls.update(controls)
+        if payload is not None:
+            self.received += 1
+            if self._payload is not None:
+                self.dropped += 1
+                replaced = True
+            self._payload = payload
+            self._received_at = received_at
+        if controls or payload is not None:
+            self._event.set()
+        return replaced
+
+    async def get(self) -> Optional[Tuple[Dict[str, Any], Any, float]]:
+        """Wait for (controls, payload or None, received_at); None once closed"""
+        while not self._closed and self._payload is None and not self._controls:
+            self._event.clear()
+            await self._event.wait()
+        if self._closed:
+            return None
+        controls, self._controls = self._controls, {}
+        payload, self._payload = self._payload, None
+        return controls, payload, self._received_at
+
+    @property
+    def has_frame(self) -> bool:
+        """A newer frame is waiting for the processor"""
+        return self._payload is not None
+
+    def close(self):
+        """Wake the processor and make it stop; anything still waiting is discarded"""
+        self._closed = True
+        self._event.set()
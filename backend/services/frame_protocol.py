@@ -0,0 +1,177 @@
+import struct
+import cv2
+import numpy as np
+from typing import Optional, Tuple, Dict, Any, List
+
+from landmarks import N_LANDMARKS
+
+# ============================================================================
+# BINARY FRAME PROTOCOL for /ws
+# ============================================================================
+#
+# Clients can send frames as binary WebSocket messages instead of
+# {"frame_b64": ...} JSON. Each message is a small fixed header, an optional
+# UTF-8 target string, then the raw encoded image (JPEG/WebP) bytes:
+#
+#   offset  size  field
+#   0       2     magic  b"OH"
+#   2       1     version (PROTOCOL_VERSION)
+#   3       1     kind    (KIND_IMAGE | KIND_LANDMARKS)
+#   4       1     flags   (FLAG_MODE | FLAG_TARGET)
+#   5       1     mode    (0=auto, 1=letters, 2=numbers) - read if FLAG_MODE
+#   6       1     target length in bytes (0 with FLAG_TARGET clears target)
+#   7       1     reserved
+#   8       n     target (UTF-8), then the image payload
+#
+# Clients that run MediaPipe Hands themselves send KIND_LANDMARKS instead:
+# the payload is what the session's detection step would have returned, so
+# the server skips image decode and Hands.process entirely:
+#
+#   offset  size  field
+#   0       1     hands (0-2; 0 = no hand in this frame)
+#   1       1     handedness bits (bit h set = hand h is "Right")
+#   2       2     reserved
+#   4       4*n   handedness score per hand (float32)
+#   ...     252*n normalized x, y, z for each of the 21 landmarks per hand
+#                 (float32, MediaPipe's order)
+#
+# MediaPipe keeps landmarks and scores as float32, so they arrive exactly as
+# the server-side detection would have produced them.
+#
+# All multi-byte fields are little-endian.
+
+MAGIC = b"OH"
+PROTOCOL_VERSION = 1
+
+KIND_IMAGE = 1
+KIND_LANDMARKS = 2
+
+FLAG_MODE = 0x01
+FLAG_TARGET = 0x02
+
+MODE_CODES = {0: "auto", 1: "letters", 2: "numbers"}
+
+HEADER = struct.Struct("<2sBBBBBx")
+LANDMARKS_HEADER = struct.Struct("<BBxx")
+MAX_HANDS = 2
+
+
+class FrameProtocolError(ValueError):
+    """Raised when a binary message can't be parsed"""
+
+
+def parse_binary_message(buf: bytes) -> Tuple[int, Dict[str, Any], memoryview]:
+    """
+    Split a binary message into (kind, controls, payload).
+
+    `controls` holds the same keys as the JSON protocol ("mode", "target") so
+    both paths can share the control handling. `payload` is a zero-copy view
+    into `buf`.
+    """
+    view = memoryview(buf)
+    if len(view) < HEADER.size:
+        raise FrameProtocolError("Message shorter than header")
+
+    magic, version, kind, flags, mode_code, target_len = HEADER.unpack_from(view)
+    if magic != MAGIC:
+        raise FrameProtocolError("Bad magic")
+    if version != PROTOCOL_VERSION:
+        raise FrameProtocolError(f"Unsupported protocol version: {version}")
+
+    controls = {}
+    if flags & FLAG_MODE:
+        if mode_code not in MODE_CODES:
+            raise FrameProtocolError(f"Unknown mode code: {mode_code}")
+        controls["mode"] = MODE_CODES[mode_code]
+
+    offset = HEADER.size
+    if flags & FLAG_TARGET:
+        end = offset + target_len
+        if end > len(view):
+            raise FrameProtocolError("Target runs past end of message")
+        try:
+            controls["target"] = bytes(view[offset:end]).decode("utf-8") or None
+        except UnicodeDecodeError:
+            raise FrameProtocolError("target is not valid UTF-8") from None
+        offset = end
+
+    return kind, controls, view[offset:]
+
+
+def decode_image(payload) -> Optional[np.ndarray]:
+    """Decode JPEG/WebP bytes (bytes or memoryview) without copying them first"""
+    if len(payload) == 0:
+        return None
+    arr = np.frombuffer(payload, dtype=np.uint8)
+    return cv2.imdecode(arr, cv2.IMREAD_COLOR)
+
+
+class LandmarkPayload:
+    """A KIND_LANDMARKS payload; decoded by the executor, like image bytes"""
+
+    __slots__ = ("data",)
+
+    def __init__(self, data):
+        self.data = data
+
+    def __len__(self):
+        return len(self.data)
+
+
+def decode_landmarks(payload) -> Tuple[Optional[np.ndarray], Optional[List[str]], Optional[np.ndarray]]:
+    """(landmarks (hands, 21, 3), labels, scores) from a KIND_LANDMARKS payload"""
+    view = memoryview(payload)
+    if len(view) < LANDMARKS_HEADER.size:
+        raise FrameProtocolError("Landmark payload shorter than its header")
+    n_hands, right_bits = LANDMARKS_HEADER.unpack_from(view)
+    if n_hands > MAX_HANDS:
+        raise FrameProtocolError(f"Too many hands: {n_hands}")
+    if len(view) != LANDMARKS_HEADER.size + 4 * n_hands * (1 + N_LANDMARKS * 3):
+        raise FrameProtocolError("Landmark payload size doesn't match its hand count")
+    if n_hands == 0:
+        return None, None, None
+
+    values = np.frombuffer(view, dtype="<f4", offset=LANDMARKS_HEADER.size)
+    if not np.isfinite(values).all():
+        # NaN/inf would poison the session's running window sums
+        raise FrameProtocolError("Non-finite landmark values")
+    scores = values[:n_hands].astype(np.float64)
+    landmarks = values[n_hands:].astype(np.float64).reshape(n_hands, N_LANDMARKS, 3)
+    labels = ["Right" if right_bits >> h & 1 else "Left" for h in range(n_hands)]
+    return landmarks, labels, scores
+
+
+def encode_landmarks(landmarks: Optional[np.ndarray], labels: Optional[List[str]] = None,
+                     scores: Optional[np.ndarray] = None) -> bytes:
+    """KIND_LANDMARKS payload for a detection result (used by tools/tests)"""
+    n_hands = 0 if landmarks is None else min(len(landmarks), MAX_HANDS)
+    labels = labels or ["Right"] * n_hands
+    scores = np.ones(n_hands) if scores is None else scores
+    right_bits = sum(1 << h for h in range(n_hands) if labels[h] == "Right")
+    values = np.concatenate([
+        np.asarray(scores[:n_hands], dtype="<f4"),
+        np.asarray(landmarks[:n_hands], dtype="<f4").reshape(-1) if n_hands else np.zeros(0, "<f4"),
+    ])
+    return LANDMARKS_HEADER.pack(n_hands, right_bits) + values.tobytes()
+
+
+def build_binary_message(payload: bytes, mode: Optional[str] = None,
+                         target: Optional[str] = None, set_target: bool = False,
+                         kind: int = KIND_IMAGE) -> bytes:
+    """Build a binary message (used by tools/tests; browsers build it in JS)"""
+    flags = 0
+    mode_code = 0
+    if mode is not None:
+        codes = {name: code for code, name in MODE_CODES.items()}
+        mode_code = codes[mode]
+        flags |= FLAG_MODE
+
+    target_bytes = b""
+    if target is not None or set_target:
+        target_bytes = (target or "").encode("utf-8")
+        if len(target_bytes) > 255:
+            raise FrameProtocolError("Target longer than 255 bytes")
+        flags |= FLAG_TARGET
+
+    header = HEADER.pack(MAGIC, PROTOCOL_VERSION, kind, flags, mode_code, len(target_bytes))
+    return header + target_bytes + bytes(payload)
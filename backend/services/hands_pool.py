@@ -0,0 +1,99 @@
+import os
+import threading
+from typing import Any, Dict, List, Tuple
+
+from mediapipe.solutions import hands as mp_hands
+
+# ============================================================================
+# HANDS POOL - reuse MediaPipe Hands graphs across sessions
+# ============================================================================
+#
+# Every session used to build its own mp_hands.Hands in __init__ (on the
+# event loop, at connect time) and tear it down in close(). Learners come and
+# go all the time, so sessions now check a graph out of this pool and hand it
+# back when they close. Graphs are keyed by their full config - letters and
+# gestures use different model_complexity and confidences - and reset()
+# when returned, so the next session starts without the previous one's
+# tracked hands.
+#
+# Graphs returned beyond the idle limit are closed. prewarm() builds graphs
+# ahead of time (main.py at startup, each inference worker before it reports
+# ready), so even the first learner per config doesn't wait for a graph
+# build; the warm-up endpoint's throwaway sessions leave built graphs too.
+#
+#   ASL_HANDS_POOL_IDLE     idle graphs kept per config (default 4, 0 disables pooling)
+#   ASL_HANDS_POOL_PREWARM  graphs built per config at startup (default 1)
+
+MAX_IDLE = int(os.environ.get("ASL_HANDS_POOL_IDLE", "4"))
+PREWARM = int(os.environ.get("ASL_HANDS_POOL_PREWARM", "1"))
+
+
+def _config_key(config: Dict[str, Any]) -> Tuple:
+    return tuple(sorted(config.items()))
+
+
+class HandsPool:
+    """Idle Hands graphs per config, shared by every session in this process"""
+
+    def __init__(self, max_idle: int = MAX_IDLE):
+        self.max_idle = max_idle
+        self._idle: Dict[Tuple, List[Any]] = {}
+        self._lock = threading.Lock()
+        self.built = 0
+        self.reused = 0
+
+    def acquire(self, config: Dict[str, Any]):
+        """A Hands graph for `config`: an idle one if available, else a new one"""
+        with self._lock:
+            idle = self._idle.get(_config_key(config))
+            if idle:
+                self.reused += 1
+                return idle.pop()
+            self.built += 1
+        return mp_hands.Hands(**config)
+
+    def prewarm(self, config: Dict[str, Any], count: int = PREWARM) -> int:
+        """Build graphs for `config` until `count` are idle (capped by max_idle); returns how many were built"""
+        key = _config_key(config)
+        built = 0
+        while True:
+            with self._lock:
+                idle = self._idle.setdefault(key, [])
+                if len(idle) >= min(count, self.max_idle):
+                    return built
+            hands = mp_hands.Hands(**config)    # outside the lock - this is the slow part
+            with self._lock:
+                self.built += 1
+                idle.append(hands)
+            built += 1
+
+    def release(self, hands, config: Dict[str, Any]):
+        """Return a graph checked out with the same config (reset, or closed if the pool is full)"""
+        with self._lock:
+            idle = self._idle.setdefault(_config_key(config), [])
+            keep = len(idle) < self.max_idle
+        if not keep:
+            hands.close()
+            return
+        try:
+            # Drop the previous session's tracked hands
+            hands.reset()
+        except Exception:
+            hands.close()
+            return
+        with self._lock:
+            if len(idle) < self.max_idle:
+                idle.append(hands)
+                return
+        hands.close()
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for graphs in idle.values():
+            for hands in graphs:
+                hands.close()
+
+
+# Shared by every session in this process
+HANDS_POOL = HandsPool()
@@ -0,0 +1,475 @@
+import asyncio
+import itertools
+import math
+import multiprocessing as mp
+import os
+import threading
+from multiprocessing import shared_memory
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from frame_protocol import LandmarkPayload
+from metrics import FRAME_STAGES
+
+# ============================================================================
+# SHARDED INFERENCE WORKERS - session state lives in worker processes
+# ============================================================================
+#
+# With ASL_EXECUTOR=process every /ws session is pinned to one worker process.
+# That worker owns the session's LettersSessionState / GesturesSessionState
+# (and so its mp_hands.Hands graph and tracking state), which lets MediaPipe
+# and the forests use every core instead of sharing one GIL.
+#
+# Each session gets one shared memory block:
+#
+#   [0, frame_bytes)        encoded frame (or client landmarks) written by the API process
+#   [frame_bytes, ...)      float64 result slots written by the worker:
+#                           has_pred, motion (NaN = None), hand_conf,
+#                           has_display, stage timings (NaN = not run),
+#                           pred[C], display[C]
+#
+# Opening a session is a round trip: the worker creates the session state
+# (loading the model if needed) and replies "ok", or with the error, which open_session raises so /ws can refuse the connection
+# properly. The API process then creates the shared memory and sends
+# "attach" ahead of the first frame. Its own registry only holds label
+# names and feature counts (model_loader.load_model_metadata).
+#
+# Only small control tuples go through the queues. "ok" replies carry the
+# model version the worker's session used, so the API side can follow hot
+# reloads (model_registry.py) with the matching labels, and the session's
+# target set rows (target_scores.py; empty unless targets are set).
+#
+# A frame the worker doesn't answer within WORKER_TIMEOUT_S gets the same
+# empty reply as an undecodable one, and the session stays open. Until the
+# late reply arrives (it is dropped by its seq) the worker may still be
+# reading that frame out of shared memory, so the session drops new frames
+# rather than overwrite it.
+
+RESULT_HEADER = 4
+TIMINGS_OFFSET = RESULT_HEADER
+PRED_OFFSET = TIMINGS_OFFSET + len(FRAME_STAGES)
+
+DEFAULT_FRAME_BYTES = 1 << 20   # 1 MiB, far above a 320px JPEG
+WORKER_TIMEOUT_S = 10.0
+WORKER_START_TIMEOUT_S = 300.0  # workers import MediaPipe before they're ready
+
+
+def _result_view(buf, frame_bytes: int, n_classes: int) -> np.ndarray:
+    return np.ndarray((PRED_OFFSET + 2 * n_classes,), dtype=np.float64,
+                      buffer=buf, offset=frame_bytes)
+
+
+# ========================================
+# Worker process side
+# ========================================
+
+def _worker_main(worker_id: int, models_config: Dict[str, Any], requests, responses):
+    # Imported here so the API process doesn't need MediaPipe loaded for this module
+    from asl_sessions import SESSION_CLASSES, create_session
+    from frame_executor import decode_and_process
+    from hands_pool import HANDS_POOL
+    from model_registry import ModelRegistry
+
+    # Each model loads the first time a session on this worker needs it
+    loaded_models = ModelRegistry(models_config)
+    sessions = {}
+    # Sessions on this worker check Hands graphs out of its own pool
+    for session_cls in SESSION_CLASSES.values():
+        HANDS_POOL.prewarm(session_cls.HANDS_CONFIG)
+    responses.put((None, worker_id, "ready", None))
+
+    while True:
+        msg = requests.get()
+        op = msg[0]
+
+        if op == "stop":
+            break
+
+        if op == "reload":
+            # Load in the background; sessions here switch after their window
+            threading.Thread(target=_reload_model, args=(worker_id, loaded_models, msg[1]),
+                             name=f"asl-reload-{msg[1]}", daemon=True).start()
+            continue
+
+        if op == "open":
+            _, session_id, seq, model, mode = msg
+            try:
+                state = create_session(model, mode=mode, loaded_models=loaded_models)
+                n_classes = len(state.get_model_info()["label_names"])
+            except Exception as e:
+                print(f"[worker {worker_id}] failed to open session {session_id}: {e}")
+                responses.put((session_id, seq, "error", str(e)))
+                continue
+            sessions[session_id] = (state, None, 0, n_classes)
+            responses.put((session_id, seq, "ok", None))
+
+        elif op == "attach":
+            _, session_id, shm_name, frame_bytes = msg
+            entry = sessions.get(session_id)
+            if entry is not None:
+                state, _, _, n_classes = entry
+                shm = shared_memory.SharedMemory(name=shm_name)
+                sessions[session_id] = (state, shm, frame_bytes, n_classes)
+
+        elif op == "frame":
+            _, session_id, seq, nbytes, encoding, controls = msg
+            entry = sessions.get(session_id)
+            if entry is None:
+                responses.put((session_id, seq, "error", "session not open"))
+                continue
+            state, shm, frame_bytes, n_classes = entry
+            try:
+                if "mode" in controls and hasattr(state, "set_mode"):
+                    state.set_mode(controls["mode"])
+                if "target" in controls:
+                    state.set_target(controls["target"])
+                if "targets" in controls:
+                    state.set_targets(controls["targets"])
+
+                payload = shm.buf[:nbytes]
+                if encoding == "b64":
+                    payload = bytes(payload).decode("ascii")
+                elif encoding == "landmarks":
+                    payload = LandmarkPayload(payload)
+                try:
+                    result = decode_and_process(state, payload)
+                finally:
+                    del payload
+
+                if result is None:
+                    responses.put((session_id, seq, "skip", None))
+                    continue
+
+                pred_proba, motion_level, hand_confidence = result
+                display = state.smoothed_proba()
+                model_info = state.get_model_info()
+                if len(model_info["label_names"]) != n_classes:
+                    # The result slots are sized for the class count the session opened with
+                    raise RuntimeError("reloaded model has a different number of classes")
+
+                out = _result_view(shm.buf, frame_bytes, n_classes)
+                out[0] = 1.0 if pred_proba is not None else 0.0
+                out[1] = math.nan if motion_level is None else motion_level
+                out[2] = hand_confidence
+                out[3] = 1.0 if display is not None else 0.0
+                timings = state.last_timings
+                for i, stage in enumerate(FRAME_STAGES):
+                    out[TIMINGS_OFFSET + i] = timings.get(stage, math.nan)
+                if pred_proba is not None:
+                    out[PRED_OFFSET:PRED_OFFSET + n_classes] = pred_proba
+                if display is not None:
+                    out[PRED_OFFSET + n_classes:] = display
+                del out
+                responses.put((session_id, seq, "ok", (model_info.get("version"), state.target_results())))
+            except Exception as e:
+                responses.put((session_id, seq, "error", repr(e)))
+
+        elif op == "close":
+            _, session_id = msg
+            entry = sessions.pop(session_id, None)
+            if entry is not None:
+                state, shm, _, _ = entry
+                try:
+                    state.close()
+                finally:
+                    if shm is not None:
+                        shm.close()
+
+    for state, shm, _, _ in sessions.values():
+        state.close()
+        if shm is not None:
+            shm.close()
+
+
+def _reload_model(worker_id: int, loaded_models, name: str):
+    try:
+        loaded_models.reload(name)
+    except Exception as e:
+        print(f"[worker {worker_id}] failed to reload model '{name}': {e}")
+
+
+# ========================================
+# API process side
+# ========================================
+
+class RemoteSessionState:
+    """
+    Stand-in for a session whose real state lives in a worker process.
+
+    Exposes what ws_endpoint reads (mode, target, thresholds, stability
+    counters, smoothed_proba) and forwards mode/target changes along with the
+    next frame so they apply in order.
+    """
+
+    def __init__(self, pool: "ShardedWorkerPool", worker: int, session_id: int,
+                 model: str, mode: str, loaded_models, session_cls):
+        self._pool = pool
+        self._worker = worker
+        self._session_id = session_id
+        self._seq = itertools.count(1)    # 0 was the open request
+        self._loaded_models = loaded_models
+        self._model_info = model_info = loaded_models[model]
+        self._pending_controls: Dict[str, Any] = {}
+        self._closed = False
+
+        n_classes = len(model_info["label_names"])
+        self._n_classes = n_classes
+        self._frame_bytes = pool.frame_bytes
+        size = self._frame_bytes + (PRED_OFFSET + 2 * n_classes) * 8
+        self._shm = shared_memory.SharedMemory(create=True, size=size)
+        self._result = _result_view(self._shm.buf, self._frame_bytes, n_classes)
+
+        self.model_name = model
+        self.mode = mode
+        self.target = None
+        self.stable_idx = None
+        self.stable_run = 0
+        self.last_ts = 0.0
+        self.MIN_CONFIDENCE = session_cls.MIN_CONFIDENCE
+        self.STABLE_N = session_cls.STABLE_N
+        self.CLASS_THRESHOLDS = session_cls.CLASS_THRESHOLDS
+        self._display = None
+        self._target_results: List[Dict[str, Any]] = []
+        self.last_timings: Dict[str, float] = {}
+
+    @property
+    def shm_name(self) -> str:
+        return self._shm.name
+
+    def get_model_info(self):
+        return self._model_info
+
+    def set_mode(self, mode: str):
+        if mode in ("auto", "letters", "numbers"):
+            self.mode = mode
+            self._pending_controls["mode"] = mode
+
+    def set_target(self, target: Optional[str]):
+        self.target = target
+        self._pending_controls["target"] = target
+
+    def set_targets(self, targets: Optional[List[str]]):
+        self._pending_controls["targets"] = targets
+        if not targets:
+            self._target_results = []
+
+    def target_results(self) -> List[Dict[str, Any]]:
+        return self._target_results
+
+    def get_confidence_threshold(self, class_name: str) -> float:
+        return self.CLASS_THRESHOLDS.get(class_name, self.MIN_CONFIDENCE)
+
+    def smoothed_proba(self) -> Optional[np.ndarray]:
+        return self._display
+
+    async def process_payload(self, payload):
+        """Ship one encoded frame to the worker; returns process_frame's tuple or None"""
+        if isinstance(payload, LandmarkPayload):
+            encoding, data = "landmarks", payload.data
+        elif isinstance(payload, str):
+            encoding, data = "b64", payload.encode("ascii")
+        else:
+            encoding, data = "image", payload
+        self.last_timings = {}
+        nbytes = len(data)
+        if nbytes > self._frame_bytes:
+            return None
+        if self._pool.busy(self._worker, self._session_id):
+            # The worker hasn't finished a timed-out frame, which still sits in the buffer
+            return None
+        self._shm.buf[:nbytes] = data
+
+        controls, self._pending_controls = self._pending_controls, {}
+        seq = next(self._seq)
+        try:
+            status, detail = await self._pool.submit(
+                self._worker, self._session_id, seq,
+                ("frame", self._session_id, seq, nbytes, encoding, controls),
+                timeout=WORKER_TIMEOUT_S,
+            )
+        except asyncio.TimeoutError:
+            print(f"[worker {self._worker}] session {self._session_id}: no reply to frame {seq} "
+                  f"within {WORKER_TIMEOUT_S}s, dropping it")
+            return None
+        if status == "skip":
+            return None
+        if status != "ok":
+            raise RuntimeError(f"Inference worker failed: {detail}")
+        version, self._target_results = detail
+        if version is not None and version != self._model_info.get("version"):
+            # The worker's session moved to a reloaded model - label replies with it too
+            latest = self._loaded_models.get(self.model_name)
+            if latest is not None and latest.get("version") == version:
+                self._model_info = latest
+
+        res = self._result
+        C = self._n_classes
+        pred_proba = res[PRED_OFFSET:PRED_OFFSET + C].copy() if res[0] else None
+        motion_level = None if math.isnan(res[1]) else float(res[1])
+        hand_confidence = float(res[2])
+        self._display = res[PRED_OFFSET + C:].copy() if res[3] else None
+        self.last_timings = {
+            stage: float(res[TIMINGS_OFFSET + i])
+            for i, stage in enumerate(FRAME_STAGES)
+            if not math.isnan(res[TIMINGS_OFFSET + i])
+        }
+        return pred_proba, motion_level, hand_confidence
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._pool.close_session(self._worker, self._session_id)
+        self._result = None
+        self._shm.close()
+        self._shm.unlink()
+
+
+class ShardedWorkerPool:
+    """Fixed set of worker processes; each session is pinned to the least loaded one"""
+
+    def __init__(self, models_config: Dict[str, Any], n_workers: Optional[int] = None,
+                 frame_bytes: int = DEFAULT_FRAME_BYTES):
+        self.models_config = models_config
+        self.n_workers = n_workers or os.cpu_count() or 1
+        self.frame_bytes = frame_bytes
+        self._ctx = mp.get_context("spawn")
+        self._requests: List[Any] = []
+        self._procs: List[Any] = []
+        self._responses = None
+        self._session_counts = [0] * self.n_workers
+        self._session_ids = itertools.count()
+        self._waiters: Dict[tuple, tuple] = {}
+        self._late: Dict[int, int] = {}    # session_id -> seq of a frame that timed out
+        self._ready = [threading.Event() for _ in range(self.n_workers)]
+        self._lock = threading.Lock()
+        self._started = False
+
+    def start(self):
+        if self._started:
+            return
+        self._responses = self._ctx.Queue()
+        for worker_id in range(self.n_workers):
+            requests = self._ctx.Queue()
+            proc = self._ctx.Process(
+                target=_worker_main,
+                args=(worker_id, self.models_config, requests, self._responses),
+                name=f"asl-worker-{worker_id}",
+                daemon=True,
+            )
+            proc.start()
+            self._requests.append(requests)
+            self._procs.append(proc)
+        threading.Thread(target=self._dispatch_responses, name="asl-worker-results", daemon=True).start()
+        self._started = True
+
+    async def open_session(self, model: str, mode: str, loaded_models: Dict[str, Any]) -> RemoteSessionState:
+        """Open a session on the least loaded worker
+
+        Raises ValueError for unknown models and RuntimeError if the model
+        can't be loaded here or in the worker.
+        """
+        from asl_sessions import SESSION_CLASSES
+
+        session_cls = SESSION_CLASSES.get(model)
+        if session_cls is None:
+            raise ValueError(f"Invalid model: {model}")
+        loop = asyncio.get_running_loop()
+        if await loop.run_in_executor(None, loaded_models.get, model) is None:
+            raise RuntimeError(f"Model '{model}' not loaded")
+
+        self.start()
+        with self._lock:
+            worker = min(range(self.n_workers), key=self._session_counts.__getitem__)
+            self._session_counts[worker] += 1
+        session_id = next(self._session_ids)
+        try:
+            # The worker may have to load the model first
+            try:
+                status, detail = await self.submit(worker, session_id, 0,
+                                                   ("open", session_id, 0, model, mode),
+                                                   timeout=WORKER_START_TIMEOUT_S)
+            except asyncio.TimeoutError:
+                raise RuntimeError(f"Inference worker {worker} didn't open the session in time")
+            if status != "ok":
+                raise RuntimeError(f"Model '{model}' failed to load: {detail}")
+            state = RemoteSessionState(self, worker, session_id, model, mode,
+                                       loaded_models, session_cls)
+        except BaseException:
+            self.close_session(worker, session_id)
+            raise
+        self._requests[worker].put(("attach", session_id, state.shm_name, self.frame_bytes))
+        return state
+
+    def reload(self, name: str):
+        """Have every worker load the new version of a model in the background"""
+        if not self._started:
+            return   # workers spawned later load the current file anyway
+        for requests in self._requests:
+            requests.put(("reload", name))
+
+    def close_session(self, worker: int, session_id: int):
+        self._requests[worker].put(("close", session_id))
+        with self._lock:
+            self._session_counts[worker] -= 1
+            self._late.pop(session_id, None)
+
+    def busy(self, worker: int, session_id: int) -> bool:
+        """Whether the worker still owes a reply to one of the session's timed-out frames"""
+        with self._lock:
+            late = session_id in self._late
+        return late and self._procs[worker].is_alive()
+
+    async def submit(self, worker: int, session_id: int, seq: int, msg: tuple,
+                     timeout: float = WORKER_TIMEOUT_S):
+        if not self._procs[worker].is_alive():
+            raise RuntimeError(f"Inference worker {worker} is not running")
+        loop = asyncio.get_running_loop()
+        if not self._ready[worker].is_set():
+            await loop.run_in_executor(None, self._ready[worker].wait, WORKER_START_TIMEOUT_S)
+        fut = loop.create_future()
+        with self._lock:
+            self._waiters[(session_id, seq)] = (loop, fut)
+        self._requests[worker].put(msg)
+        try:
+            return await asyncio.wait_for(fut, timeout)
+        except asyncio.TimeoutError:
+            with self._lock:
+                self._late[session_id] = seq
+            raise
+        finally:
+            with self._lock:
+                self._waiters.pop((session_id, seq), None)
+
+    def _dispatch_responses(self):
+        while True:
+            try:
+                session_id, seq, status, error = self._responses.get()
+            except (EOFError, OSError):
+                return
+            if status == "ready":
+                self._ready[seq].set()
+                continue
+            with self._lock:
+                waiter = self._waiters.pop((session_id, seq), None)
+                if waiter is None and self._late.get(session_id) == seq:
+                    # Reply to a frame that timed out: the worker is done with it, drop the reply
+                    del self._late[session_id]
+            if waiter is None:
+                continue
+            loop, fut = waiter
+            loop.call_soon_threadsafe(_resolve, fut, (status, error))
+
+    def shutdown(self):
+        if not self._started:
+            return
+        for requests in self._requests:
+            requests.put(("stop",))
+        for proc in self._procs:
+            proc.join(timeout=5)
+
+
+def _resolve(fut: asyncio.Future, value):
+    if not fut.done():
+        fut.set_result(value)
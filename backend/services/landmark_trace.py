@@ -0,0 +1,145 @@
+import os
+import shutil
+from itertools import count
+from time import strftime
+from typing import Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from landmarks import N_LANDMARKS
+
+# ============================================================================
+# LANDMARK TRACES - record what MediaPipe saw, replay it without MediaPipe
+# ============================================================================
+#
+# Hands.process dominates every frame, so profiling the feature and
+# predict_proba stages on live video mostly measures MediaPipe. A trace
+# keeps one fixed-size record per frame of what the session's detection
+# step returned - the (2, 21, 3) landmarks and the handedness - and
+# replay_trace feeds those straight into the session's process_landmarks,
+# i.e. the same features / window / predict_proba path process_frame runs.
+#
+# A trace file is a plain .npy array of TRACE_DTYPE records, so
+# np.load(path, mmap_mode="r") maps it without reading it in:
+#
+#   detected   0 where the session skipped MediaPipe for this frame
+#              (gestures FRAME_PROCESS_SKIP), else 1
+#   n_hands    hands found (0-2)
+#   n_handed   handedness entries (0 = MediaPipe gave none)
+#   handed     0 = "Left", 1 = "Right", per hand
+#   score      handedness score per hand
+#   landmarks  normalized x, y, z per hand; unused slots are zero
+#
+# Landmarks are kept as float64 (ROI tracking maps them back to full-frame
+# coordinates in float64) and scores are float32 in MediaPipe's protobuf
+# already, so replayed features and predictions are bit-identical.
+#
+#   ASL_TRACE_DIR  when set, every session records a trace into this directory
+#                  (<model>-<time>-<pid>-<n>.npy, written when the session closes)
+
+MAX_HANDS = 2
+HANDEDNESS_LABELS = ("Left", "Right")
+
+TRACE_DTYPE = np.dtype([
+    ("detected", "u1"),
+    ("n_hands", "u1"),
+    ("n_handed", "u1"),
+    ("handed", "u1", (MAX_HANDS,)),
+    ("score", "<f4", (MAX_HANDS,)),
+    ("landmarks", "<f8", (MAX_HANDS, N_LANDMARKS, 3)),
+])
+
+_trace_ids = count()
+
+
+class TraceRecorder:
+    """Appends one TRACE_DTYPE record per frame; the .npy is written on close()"""
+
+    CHUNK = 4096   # records buffered before they're appended to the .part file
+
+    def __init__(self, path: str):
+        self.path = path
+        self.count = 0
+        self._part = open(path + ".part", "wb")
+        self._chunk = np.zeros(self.CHUNK, dtype=TRACE_DTYPE)
+        self._n = 0
+
+    def record(self, landmarks: Optional[np.ndarray], labels: Optional[List[str]] = None,
+               scores: Optional[np.ndarray] = None, detected: bool = True):
+        """Store one frame's detection result (landmarks (H,21,3), labels, scores)"""
+        rec = self._chunk[self._n]
+        rec["detected"] = detected
+        if landmarks is not None:
+            n = min(len(landmarks), MAX_HANDS)
+            rec["n_hands"] = n
+            rec["landmarks"][:n] = landmarks[:n]
+        if labels:
+            n = min(len(labels), len(scores), MAX_HANDS)
+            rec["n_handed"] = n
+            rec["handed"][:n] = [HANDEDNESS_LABELS.index(label) for label in labels[:n]]
+            rec["score"][:n] = scores[:n]
+        self._n += 1
+        self.count += 1
+        if self._n == self.CHUNK:
+            self._flush()
+
+    def _flush(self):
+        self._part.write(self._chunk[:self._n].tobytes())
+        self._chunk[:self._n] = 0
+        self._n = 0
+
+    def close(self):
+        """Write the .npy (header + records) and remove the .part file"""
+        if self._part.closed:
+            return
+        self._flush()
+        self._part.close()
+        header = {
+            "descr": np.lib.format.dtype_to_descr(TRACE_DTYPE),
+            "fortran_order": False,
+            "shape": (self.count,),
+        }
+        with open(self.path, "wb") as out, open(self.path + ".part", "rb") as src:
+            np.lib.format.write_array_header_1_0(out, header)
+            shutil.copyfileobj(src, out)
+        os.remove(self.path + ".part")
+
+
+def open_session_trace(model_name: str) -> Optional[TraceRecorder]:
+    """A recorder for a new session if ASL_TRACE_DIR is set, else None"""
+    trace_dir = os.environ.get("ASL_TRACE_DIR")
+    if not trace_dir:
+        return None
+    os.makedirs(trace_dir, exist_ok=True)
+    name = f"{model_name}-{strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{next(_trace_ids)}.npy"
+    return TraceRecorder(os.path.join(trace_dir, name))
+
+
+def load_trace(path: str) -> np.ndarray:
+    """Memory-mapped TRACE_DTYPE records"""
+    trace = np.load(path, mmap_mode="r")
+    if trace.dtype != TRACE_DTYPE:
+        raise ValueError(f"{path} is not a landmark trace (dtype {trace.dtype})")
+    return trace
+
+
+def unpack_record(rec) -> Tuple[Optional[np.ndarray], Optional[List[str]], Optional[np.ndarray]]:
+    """(landmarks, labels, scores) as the session's detection step returned them"""
+    n = int(rec["n_hands"])
+    landmarks = rec["landmarks"][:n] if n else None
+    n_handed = int(rec["n_handed"])
+    if not n_handed:
+        return landmarks, None, None
+    labels = [HANDEDNESS_LABELS[c] for c in rec["handed"][:n_handed]]
+    return landmarks, labels, rec["score"][:n_handed].astype(np.float64)
+
+
+def replay_trace(state, trace: np.ndarray) -> Iterator[Tuple[Optional[np.ndarray], Optional[float], float]]:
+    """Feed each record to state.process_landmarks, yielding what process_frame would return"""
+    for rec in trace:
+        state.last_timings = {}
+        landmarks, labels, scores = unpack_record(rec)
+        if rec["detected"]:
+            yield state.process_landmarks(landmarks, labels, scores)
+        else:
+            yield state.process_landmarks(None, detected=False)
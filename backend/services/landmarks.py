@@ -0,0 +1,33 @@
+import numpy as np
+from typing import List, Optional, Tuple
+
+# ============================================================================
+# HAND LANDMARK ARRAYS - MediaPipe results -> (hands, 21, 3)
+# ============================================================================
+#
+# The session feature paths used to walk every protobuf landmark in Python
+# several times per hand per frame (ordering, min-normalization, packing).
+# Here the landmarks are read out once into a float64 array and everything
+# after that is array math. Values are the same doubles the landmark
+# attributes return, so features built from the array match the old ones.
+
+N_LANDMARKS = 21
+
+
+def landmarks_from_results(results) -> Optional[np.ndarray]:
+    """multi_hand_landmarks as a (hands, 21, 3) float64 array (None if no hands)"""
+    hand_list = getattr(results, "multi_hand_landmarks", None)
+    if not hand_list:
+        return None
+    coords = [(lm.x, lm.y, lm.z) for hl in hand_list for lm in hl.landmark]
+    return np.array(coords, dtype=np.float64).reshape(len(hand_list), N_LANDMARKS, 3)
+
+
+def handedness_from_results(results) -> Tuple[Optional[List[str]], Optional[np.ndarray]]:
+    """Per-hand ("Left"/"Right" labels, scores), or (None, None) without multi_handedness"""
+    handed = getattr(results, "multi_handedness", None)
+    if not handed:
+        return None, None
+    labels = [h.classification[0].label for h in handed]
+    scores = np.array([h.classification[0].score for h in handed], dtype=np.float64)
+    return labels, scores
@@ -1,19 +1,27 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
+from fastapi.responses import PlainTextResponse
+import asyncio
 import sys
 import os
-import io
-import base64
-import pickle
 import json
-import cv2
 import numpy as np
-from collections import deque
-from time import time
+from time import time, perf_counter
 from typing import Optional, List, Dict
-from fastapi import WebSocket, WebSocketDisconnect, Query
-from asl_sessions import LettersSessionState, GesturesSessionState
+from fastapi import WebSocket, WebSocketDisconnect, Query, HTTPException
+from asl_sessions import SESSION_CLASSES
+from frame_protocol import (parse_binary_message, FrameProtocolError, KIND_IMAGE, KIND_LANDMARKS,
+                            LandmarkPayload)
+from frame_executor import FrameExecutor
+from frame_mailbox import FrameMailbox
+from hands_pool import HANDS_POOL
+from metrics import METRICS
+from model_loader import load_model_metadata, load_model_safely
+from model_registry import ModelRegistry, preload_names
+from batch_predictor import BatchedPredictor
+from rate_governor import NodeLoad, RateGovernor
+from replies import ReplyDelta, dumps, top_k
 import warnings
 
 # Suppress annoying protobuf warnings
@@ -79,147 +87,133 @@ MODELS = {
 # MIN_DT = 1.0 / TARGET_FPS
 
 # ========================================
-# Load Model and Define Helpers
+# MediaPipe Setup
 # ========================================
-def load_model_safely(model_path, labels_path=None):
-    if not os.path.exists(model_path):
-        raise FileNotFoundError(f"Model file not found: {model_path}")
-    with open(model_path, "rb") as f:
-        obj = pickle.load(f)
-
-    model = obj.get("model", obj)
-    meta_classes = obj.get("classes", None)
-    n_features = getattr(model, "n_features_in_", None)
+mp_hands = mp.solutions.hands
+mp_draw = mp.solutions.drawing_utils
+mp_styles = mp.solutions.drawing_styles
 
-    label_names = None
-    
-    # 1. Try loading from external JSON if provided
-    if labels_path and os.path.exists(labels_path):
-        try:
-            with open(labels_path, "r", encoding="utf-8") as f:
-                label_names = json.load(f)
-        except Exception as e:
-            print(f"[WARN] Failed to load labels from {labels_path}: {e}")
-
-    # 2. Key fallbacks if JSON didn't work or wasn't provided
-    if not label_names:
-        if isinstance(meta_classes, (list, tuple)) and len(meta_classes) > 0:
-            label_names = [str(c) for c in meta_classes]
-        else:
-            model_classes = list(getattr(model, "classes_", []))
-            label_names = [str(c) for c in model_classes]
-            
-    if not label_names:
-        raise RuntimeError("Could not resolve class names from model/meta.")
+# ========================================
+# Frame Executor
+# ========================================
+FRAME_EXECUTOR = FrameExecutor.from_env(models_config=MODELS)
 
-    return model, label_names, n_features
+# Shared by every session's RateGovernor to scale target_fps with load
+NODE_LOAD = NodeLoad(capacity=FRAME_EXECUTOR.capacity)
 
-# Load all models at startup
-LOADED_MODELS = {}
-for model_name, config in MODELS.items():
-    try:
-        model, label_names, n_features = load_model_safely(
-            config["path"], 
-            labels_path=config.get("labels_path")
-        )
-        LOADED_MODELS[model_name] = {
-            "model": model,
-            "label_names": label_names,
-            "n_features": n_features,
-            "description": config["description"]
-        }
-        print(f"✓ Loaded model '{model_name}': {len(label_names)} classes, {n_features} features")
-        print(f"  Classes: {', '.join(label_names[:10])}{'...' if len(label_names) > 10 else ''}")
-    except Exception as e:
-        print(f"✗ Failed to load model '{model_name}': {e}")
-
-# Keep backward compatibility - default to letters model
-if "letters" in LOADED_MODELS:
-    MODEL = LOADED_MODELS["letters"]["model"]
-    LABEL_NAMES = LOADED_MODELS["letters"]["label_names"]
-    N_FEATURES = LOADED_MODELS["letters"]["n_features"]
-else:
-    raise RuntimeError("Failed to load default 'letters' model")
+# Merge concurrent single-row predict_proba calls into one batch. Only the
+# thread executor has several sessions predicting at once in this process.
+BATCH_MAX_WAIT_MS = float(os.environ.get("ASL_BATCH_MAX_WAIT_MS", "0"))
+BATCH_MAX_SIZE = int(os.environ.get("ASL_BATCH_MAX_SIZE", "64"))
+wrap_model = None
+if BATCH_MAX_WAIT_MS > 0 and FRAME_EXECUTOR.kind == "thread":
+    def wrap_model(model):
+        return BatchedPredictor(model, max_wait_ms=BATCH_MAX_WAIT_MS, max_batch=BATCH_MAX_SIZE)
 
 # ========================================
-# MediaPipe Setup
+# Load Models
 # ========================================
-mp_hands = mp.solutions.hands
-mp_draw = mp.solutions.drawing_utils
-mp_styles = mp.solutions.drawing_styles
+# Loaded on first use (see model_registry.py); ASL_PRELOAD_MODELS warms some at startup.
+# With worker processes this process only needs label names and feature counts.
+LOADED_MODELS = ModelRegistry(
+    MODELS, wrap=wrap_model,
+    loader=load_model_metadata if FRAME_EXECUTOR.kind == "process" else load_model_safely,
+)
+PRELOAD_MODELS = preload_names(MODELS, os.environ.get("ASL_PRELOAD_MODELS", ""))
+
+async def warmup_model(name: str) -> Dict[str, float]:
+    """Load a model, run dummy batches through it and the Hands graph"""
+    loop = asyncio.get_running_loop()
+    timings = await loop.run_in_executor(None, LOADED_MODELS.warmup, name)
+    timings["hands_s"] = round(await FRAME_EXECUTOR.warmup(name, LOADED_MODELS), 3)
+    return timings
 
 @app.websocket("/ws")
 async def ws_endpoint(
     ws: WebSocket, 
     mode: str = Query(default="auto"),
-    model: str = Query(default="letters")
+    model: str = Query(default="letters"),
+    replies: str = Query(default="full")
 ):
     await ws.accept()
     
     # Validate and create appropriate session - PASS LOADED_MODELS
-    if model == "letters":
-        state = LettersSessionState(mode=mode, loaded_models=LOADED_MODELS)
-    elif model == "gestures":
-        state = GesturesSessionState(loaded_models=LOADED_MODELS)
-    else:
+    # (the first session for a model loads it, off the event loop)
+    try:
+        state = await FRAME_EXECUTOR.open_session(model, mode, LOADED_MODELS)
+    except ValueError:
         await ws.send_json({
             "error": f"Invalid model: {model}",
-            "available_models": ["letters", "gestures"]
+            "available_models": list(SESSION_CLASSES)
         })
-        await ws.close()
+        await ws.close(code=1008)
+        return
+    except RuntimeError as e:
+        print(f"✗ Couldn't open a '{model}' session: {e}")
+        await ws.send_json({"error": f"Model '{model}' is not available"})
+        await ws.close(code=1011)
         return
     
     model_info = state.get_model_info()
-    
-    try:
-        await ws.send_json({
-            "hello": True, 
-            "mode": mode if model == "letters" else None,
-            "model": model,
-            "n_features": int(model_info["n_features"]),
-            "n_classes": len(model_info["label_names"])
-        })
-        
+    runner = FRAME_EXECUTOR.session()
+    governor = RateGovernor(NODE_LOAD)
+    mailbox = FrameMailbox()
+    delta = None    # ReplyDelta for ?replies=delta clients, set up with the hello
+
+    async def flush_delta():
+        """Send changes ReplyDelta held back for a newer frame that didn't reply"""
+        held = delta.flush() if delta is not None else None
+        if held is not None:
+            await ws.send_text(dumps(held))
+
+    async def process_frames():
+        """Processor task: always works on the newest frame in the mailbox"""
         while True:
-            msg = await ws.receive_text()
-            try:
-                data = json.loads(msg)
-            except json.JSONDecodeError:
-                continue
-
-            now = time()
-            min_dt = 1.0 / 10.0  # 10 FPS
-            if now - state.last_ts < min_dt:
-                continue
-            state.last_ts = now
+            if not mailbox.has_frame:
+                await flush_delta()
+            item = await mailbox.get()
+            if item is None:
+                return
+            controls, payload, received_at = item
+            model_name = state.model_name
 
             # Handle mode changes (letters only)
-            if "mode" in data and isinstance(state, LettersSessionState):
-                state.set_mode(data["mode"])
+            if "mode" in controls and state.model_name == "letters":
+                state.set_mode(controls["mode"])
             
             # Handle target updates (both models)
-            if "target" in data:
-                t = data["target"]
+            if "target" in controls:
+                t = controls["target"]
                 if not t: 
                     t = None
                 if hasattr(state, "set_target"):
                     state.set_target(t)
 
-            b64 = data.get("frame_b64")
-            if not b64:
-                continue
+            # Several candidate targets scored at once (quizzes, daily challenge)
+            if "targets" in controls:
+                targets = controls["targets"]
+                if not isinstance(targets, list):
+                    targets = None
+                state.set_targets(targets)
 
-            try:
-                buf = base64.b64decode(b64)
-                arr = np.frombuffer(buf, dtype=np.uint8)
-                frame = cv2.imdecode(arr, cv2.IMREAD_COLOR)
-                if frame is None:
-                    continue
-            except Exception:
+            if payload is None:
                 continue
-
-            # Process frame
-            pred_proba, motion_level, hand_confidence = state.process_frame(frame)
+            METRICS.observe("mailbox_wait", model_name, perf_counter() - received_at)
+
+            # Decode + process frame on the executor, not the event loop
+            result = await runner.process(state, payload)
+            done = perf_counter()
+            governor.record(done - received_at, done)
+            METRICS.observe_stages(model_name, state.last_timings)
+            METRICS.inc("asl_frames_processed_total", model=model_name)
+            if "predict_reused" in state.last_timings:
+                METRICS.inc("asl_predictions_total", model=model_name, result="reused")
+            elif "predict_proba" in state.last_timings:
+                METRICS.inc("asl_predictions_total", model=model_name, result="computed")
+            if result is None:
+                await flush_delta()
+                continue
+            pred_proba, motion_level, hand_confidence = result
 
             # Get labels for reply
             model_info = state.get_model_info()
@@ -237,14 +231,17 @@ async def ws_endpoint(
                 "motion": motion_level,
                 "hand_conf": hand_confidence,
                 "n_features": int(current_n_features),
-                "mode": state.mode if isinstance(state, LettersSessionState) else None,
+                "mode": state.mode if state.model_name == "letters" else None,
                 "model": state.model_name,
+                "targets": state.target_results(),
+                "dropped": mailbox.dropped + governor.dropped,
+                **governor.advice(),
             }
 
-            if state.proba_buffer:
-                proba_display = np.mean(np.stack(state.proba_buffer, axis=0), axis=0)
+            proba_display = state.smoothed_proba()
+            if proba_display is not None:
                 top_idx = int(np.argmax(proba_display))
-                top_prob = float(np.max(proba_display))
+                top_prob = float(proba_display[top_idx])
                 top_class = current_labels[top_idx]
 
                 # stability tracking
@@ -261,7 +258,7 @@ async def ws_endpoint(
                 if state.target:
 
                         # send top-5 distribution
-                        idxs = np.argsort(proba_display)[::-1][:5]
+                        idxs = top_k(proba_display, 5)
                         reply["probs"] = [
                             {"name": current_labels[i], "p": float(proba_display[i])}
                             for i in idxs
@@ -269,27 +266,148 @@ async def ws_endpoint(
 
 
 
-            await ws.send_json(reply)
+            if delta is not None:
+                reply = delta.message(reply, newer_waiting=mailbox.has_frame)
+                if reply is None:
+                    METRICS.inc("asl_replies_skipped_total", model=model_name)
+                    continue
+
+            t0 = perf_counter()
+            await ws.send_text(dumps(reply))
+            sent = perf_counter()
+            METRICS.observe("send_json", model_name, sent - t0)
+            METRICS.observe("frame_total", model_name, sent - received_at)
+
+    hello = {
+        "hello": True,
+        "mode": mode if model == "letters" else None,
+        "model": model,
+        "n_features": int(model_info["n_features"]),
+        "n_classes": len(model_info["label_names"]),
+        "replies": "delta" if replies == "delta" else "full",
+        **governor.advice(),
+    }
+    if replies == "delta":
+        # Later messages only carry what changed since this one
+        delta = ReplyDelta({**hello, "top": None, "conf": None, "probs": [], "targets": [], "dropped": 0})
+    processor = asyncio.create_task(process_frames())
+    
+    try:
+        await ws.send_json(hello)
+        
+        # Receiver: only parses messages and hands them to the processor
+        while not processor.done():
+            t0 = perf_counter()
+            message = await ws.receive()
+            t1 = perf_counter()
+            if message["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(message.get("code", 1000))
+            # Idle time until the client's next message, not receive cost
+            METRICS.observe("receive_wait", state.model_name, t1 - t0)
+
+            # Binary frames: fixed header + raw JPEG/WebP bytes, or landmarks the
+            # client detected itself (see frame_protocol.py)
+            # Text frames: legacy {"frame_b64": ..., "mode": ..., "target": ...} JSON
+            if message.get("bytes") is not None:
+                try:
+                    kind, data, payload = parse_binary_message(message["bytes"])
+                except FrameProtocolError:
+                    continue
+                METRICS.observe("binary_parse", state.model_name, perf_counter() - t1)
+                if kind == KIND_LANDMARKS:
+                    payload = LandmarkPayload(payload)
+                elif kind != KIND_IMAGE:
+                    continue
+            else:
+                try:
+                    data = json.loads(message.get("text") or "")
+                except json.JSONDecodeError:
+                    continue
+                METRICS.observe("json_parse", state.model_name, perf_counter() - t1)
+                payload = data.get("frame_b64") or None
+
+            controls = {k: data[k] for k in ("mode", "target", "targets") if k in data}
+
+            # Drop frames sent faster than this session's target_fps (controls still go through)
+            now = perf_counter()
+            if payload is not None:
+                if governor.admit(now):
+                    state.last_ts = time()
+                else:
+                    payload = None
+                    METRICS.inc("asl_frames_dropped_total", model=state.model_name, reason="rate")
+
+            if mailbox.put(controls, payload, received_at=now):
+                METRICS.inc("asl_frames_dropped_total", model=state.model_name, reason="mailbox")
 
     except WebSocketDisconnect:
         pass
     finally:
-        state.close()
+        mailbox.close()
+        try:
+            # Let the processor finish the frame it's on (and surface its errors)
+            await processor
+        except WebSocketDisconnect:
+            pass
+        finally:
+            await runner.drain()
+            state.close()
+            governor.close()
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus scrape endpoint: per-stage latency histograms by model"""
+    METRICS.set_gauge("asl_active_sessions", NODE_LOAD.sessions)
+    METRICS.set_gauge("asl_hands_graphs_built", HANDS_POOL.built)
+    METRICS.set_gauge("asl_hands_graphs_reused", HANDS_POOL.reused)
+    return PlainTextResponse(METRICS.render(), media_type="text/plain; version=0.0.4")
 
 @app.get("/api/models")
 async def get_available_models():
-    """Get list of available models and their info"""
-    return {
-        "models": {
-            name: {
-                "description": info["description"],
+    """Get list of available models and their info (classes only once loaded)"""
+    models = {}
+    for name, config in MODELS.items():
+        models[name] = {"description": config["description"], "loaded": LOADED_MODELS.is_loaded(name)}
+        if LOADED_MODELS.is_loaded(name):
+            info = LOADED_MODELS[name]
+            models[name].update({
                 "n_features": info["n_features"],
                 "n_classes": len(info["label_names"]),
                 "classes": info["label_names"]
-            }
-            for name, info in LOADED_MODELS.items()
-        }
-    }
+            })
+    return {"models": models}
+
+@app.post("/api/models/{name}/warmup")
+async def warmup_model_endpoint(name: str):
+    """Load a model if needed and warm it up before traffic arrives"""
+    if name not in MODELS:
+        raise HTTPException(status_code=404, detail=f"Unknown model: {name}")
+    try:
+        timings = await warmup_model(name)
+    except (KeyError, RuntimeError):
+        raise HTTPException(status_code=503, detail=f"Model '{name}' failed to load")
+    return {"model": name, "warm": True, **timings}
+
+@app.post("/api/models/{name}/reload")
+async def reload_model_endpoint(name: str):
+    """Load a new version of a model file and switch sessions to it without disconnecting them"""
+    if name not in MODELS:
+        raise HTTPException(status_code=404, detail=f"Unknown model: {name}")
+    loop = asyncio.get_running_loop()
+    try:
+        result = await loop.run_in_executor(
+            None, LOADED_MODELS.reload, name, FRAME_EXECUTOR.fixed_class_count
+        )
+    except OSError as e:
+        raise HTTPException(status_code=404, detail=f"Model file for '{name}' not found: {e}")
+    except ValueError as e:
+        # Checked before the worker processes hear about it, so their sessions keep running
+        raise HTTPException(status_code=409, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    if result["reloaded"]:
+        FRAME_EXECUTOR.reload(name)
+    return result
 # ========================================
 # CORS middleware and Router Inclusion
 # =======================================
@@ -314,6 +432,19 @@ app.include_router(progress_router)
 
 app.mount("/static", StaticFiles(directory="uploads"), name="static")
 
+@app.on_event("startup")
+async def start_frame_executor():
+    FRAME_EXECUTOR.start()
+    # Hands graphs for every session config, so no connect waits on a build
+    await asyncio.get_running_loop().run_in_executor(None, FRAME_EXECUTOR.prewarm_hands)
+    for name in PRELOAD_MODELS:
+        print(f"✓ Warmed up model '{name}': {await warmup_model(name)}")
+
+@app.on_event("shutdown")
+async def shutdown_frame_executor():
+    FRAME_EXECUTOR.shutdown()
+    LOADED_MODELS.close()
+
 @app.get("/")
 async def root():
     return {"message": "OpenHand API is running!"}
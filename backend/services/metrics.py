@@ -0,0 +1,130 @@
+import math
+from bisect import bisect_left
+from typing import Dict, List, Tuple
+
+# ============================================================================
+# METRICS - per-stage latency histograms, Prometheus text format
+# ============================================================================
+#
+# Every /ws frame records how long each pipeline stage took, labeled by model
+# (letters / gestures), and GET /metrics renders the lot for Prometheus.
+#
+# Stages timed by the session itself (in the executor thread or worker
+# process) land in state.last_timings and are observed by ws_endpoint after
+# the frame comes back:
+#
+#   b64_decode, imdecode         decode_and_process
+#   landmarks_decode             process_client_landmarks (KIND_LANDMARKS frames,
+#                                instead of decode and MediaPipe)
+#   cvtcolor, hands_process      _detect_hands / HandRoiTracker
+#   features, predict_proba      process_frame
+#   predict_reused               process_frame, instead of predict_proba when the
+#                                letters session reused its last output
+#
+# ws_endpoint times the rest itself: receive_wait (idle time in ws.receive
+# until the client's next message arrives - mostly the gap between client
+# frames, not a processing cost), json_parse / binary_parse, mailbox_wait,
+# send_json, and frame_total (receipt to reply sent).
+#
+# Counter and gauge values are rendered exactly (ints as ints, floats with
+# repr), so large counters don't lose digits to %g and appear to stall.
+#
+# Observing is a bisect plus a few adds on the event loop, cheap enough for
+# every frame.
+
+FRAME_STAGES = ("b64_decode", "imdecode", "landmarks_decode", "cvtcolor", "hands_process", "features", "predict_proba",
+                "predict_reused")
+
+LATENCY_BUCKETS_S = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+
+class Histogram:
+    """Fixed-bucket histogram (counts are per bucket, made cumulative when rendered)"""
+
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds: Tuple[float, ...] = LATENCY_BUCKETS_S):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)   # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+def _labels(labels: Dict[str, str]) -> str:
+    return ",".join(f'{k}="{v}"' for k, v in labels.items())
+
+
+def _number(value) -> str:
+    """A sample value in full precision (Prometheus spellings for inf / NaN)"""
+    if isinstance(value, int):
+        return str(int(value))
+    value = float(value)
+    if math.isnan(value):
+        return "NaN"
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(value)
+
+
+class PipelineMetrics:
+    """Stage latency histograms plus a few counters and gauges for the ASL pipeline"""
+
+    def __init__(self):
+        self._latency: Dict[Tuple[str, str], Histogram] = {}
+        self._counters: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], float] = {}
+        self._gauges: Dict[str, float] = {}
+
+    def observe(self, stage: str, model: str, seconds: float):
+        hist = self._latency.get((model, stage))
+        if hist is None:
+            hist = self._latency[(model, stage)] = Histogram()
+        hist.observe(seconds)
+
+    def observe_stages(self, model: str, timings: Dict[str, float]):
+        """Record every stage a session timed for its last frame"""
+        for stage, seconds in timings.items():
+            self.observe(stage, model, seconds)
+
+    def inc(self, name: str, value: float = 1, **labels: str):
+        key = (name, tuple(sorted(labels.items())))
+        self._counters[key] = self._counters.get(key, 0) + value
+
+    def set_gauge(self, name: str, value: float):
+        self._gauges[name] = value
+
+    def render(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)"""
+        out: List[str] = [
+            "# HELP asl_stage_latency_seconds Per-frame latency of each ASL pipeline stage",
+            "# TYPE asl_stage_latency_seconds histogram",
+        ]
+        for (model, stage), hist in sorted(self._latency.items()):
+            base = {"model": model, "stage": stage}
+            cumulative = 0
+            for bound, n in zip(hist.bounds, hist.counts):
+                cumulative += n
+                out.append(f'asl_stage_latency_seconds_bucket{{{_labels(base)},le="{bound}"}} {cumulative}')
+            out.append(f'asl_stage_latency_seconds_bucket{{{_labels(base)},le="+Inf"}} {hist.count}')
+            out.append(f"asl_stage_latency_seconds_sum{{{_labels(base)}}} {hist.sum}")
+            out.append(f"asl_stage_latency_seconds_count{{{_labels(base)}}} {hist.count}")
+
+        for name in sorted({name for name, _ in self._counters}):
+            out.append(f"# TYPE {name} counter")
+            for (n, labels), value in sorted(self._counters.items()):
+                if n == name:
+                    out.append(f"{name}{{{_labels(dict(labels))}}} {_number(value)}")
+
+        for name, value in sorted(self._gauges.items()):
+            out.append(f"# TYPE {name} gauge")
+            out.append(f"{name} {_number(value)}")
+
+        return "\n".join(out) + "\n"
+
+
+# Shared by every session in this process
+METRICS = PipelineMetrics()
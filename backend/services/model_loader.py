@@ -0,0 +1,121 @@
+import os
+import json
+import pickle
+from typing import Dict, Any
+
+from forest_engine import CompiledForest, compiled_model_path
+from model_store import open_store, store_enabled, write_store
+
+# ========================================
+# Model Loading
+# ========================================
+# Shared by the API process and the inference worker processes, so this
+# module must stay free of FastAPI / Firestore imports.
+#
+#   ASL_FOREST_ENGINE  "compiled" (default) serves tree ensembles through
+#                      forest_engine.CompiledForest, "sklearn" keeps the
+#                      pickled estimator
+#
+# Compiled forests are mapped from the per-node model store (model_store.py)
+# so worker processes share one copy of the trees.
+
+FOREST_ENGINE = os.environ.get("ASL_FOREST_ENGINE", "compiled").lower()
+
+def _compile_model(model, meta_classes=None):
+    """Swap a fitted tree ensemble for its CompiledForest (anything else is returned as is)"""
+    if not hasattr(model, "estimators_") and not hasattr(model, "tree_"):
+        return model
+    if isinstance(meta_classes, (list, tuple)) and len(meta_classes) > 0:
+        meta_classes = [str(c) for c in meta_classes]
+    else:
+        meta_classes = None
+    try:
+        return CompiledForest.from_sklearn(model, meta_classes=meta_classes)
+    except Exception as e:
+        print(f"[WARN] Serving sklearn model, compile failed: {e}")
+        return model
+
+def load_model_safely(model_path, labels_path=None):
+    if not os.path.exists(model_path):
+        raise FileNotFoundError(f"Model file not found: {model_path}")
+
+    use_store = FOREST_ENGINE == "compiled" and store_enabled()
+    compiled_path = compiled_model_path(model_path)
+    model = open_store(model_path) if use_store else None
+    stored = model is not None
+    if stored:
+        # Another worker on this node already stored it - just map the arrays
+        meta_classes = model.meta_classes
+    elif (FOREST_ENGINE == "compiled" and os.path.exists(compiled_path)
+            and os.path.getmtime(compiled_path) >= os.path.getmtime(model_path)):
+        # Exported by forest_engine.py - no need to unpickle sklearn
+        model = CompiledForest.load(compiled_path)
+        meta_classes = model.meta_classes
+    else:
+        with open(model_path, "rb") as f:
+            obj = pickle.load(f)
+        model = obj.get("model", obj)
+        meta_classes = obj.get("classes", None)
+        if FOREST_ENGINE == "compiled":
+            model = _compile_model(model, meta_classes)
+
+    if use_store and not stored and isinstance(model, CompiledForest):
+        try:
+            model = write_store(model_path, model)
+        except (OSError, ValueError) as e:
+            print(f"[WARN] Model store unavailable, keeping a private copy: {e}")
+
+    n_features = getattr(model, "n_features_in_", None)
+
+    label_names = None
+    
+    # 1. Try loading from external JSON if provided
+    if labels_path and os.path.exists(labels_path):
+        try:
+            with open(labels_path, "r", encoding="utf-8") as f:
+                label_names = json.load(f)
+        except Exception as e:
+            print(f"[WARN] Failed to load labels from {labels_path}: {e}")
+
+    # 2. Key fallbacks if JSON didn't work or wasn't provided
+    if not label_names:
+        if isinstance(meta_classes, (list, tuple)) and len(meta_classes) > 0:
+            label_names = [str(c) for c in meta_classes]
+        else:
+            model_classes = list(getattr(model, "classes_", []))
+            label_names = [str(c) for c in model_classes]
+            
+    if not label_names:
+        raise RuntimeError("Could not resolve class names from model/meta.")
+
+    return model, label_names, n_features
+
+def load_model_metadata(model_path, labels_path=None):
+    """Like load_model_safely, but returns None for the model (label names and n_features only)
+
+    For the API process when worker processes do the predicting. With the
+    model store this only maps the stored arrays, and they're dropped again.
+    """
+    _, label_names, n_features = load_model_safely(model_path, labels_path=labels_path)
+    return None, label_names, n_features
+
+def load_models(models_config: Dict[str, Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """Load every model in `models_config` (the MODELS dict in main.py)"""
+    loaded = {}
+    for model_name, config in models_config.items():
+        try:
+            model, label_names, n_features = load_model_safely(
+                config["path"], 
+                labels_path=config.get("labels_path")
+            )
+            loaded[model_name] = {
+                "model": model,
+                "label_names": label_names,
+                "n_features": n_features,
+                "description": config["description"]
+            }
+            print(f"✓ Loaded model '{model_name}': {len(label_names)} classes, {n_features} features")
+            print(f"  Classes: {', '.join(label_names[:10])}{'...' if len(label_names) > 10 else ''}")
+        except Exception as e:
+            print(f"✗ Failed to load model '{model_name}': {e}")
+    return loaded
@@ -0,0 +1,195 @@
+import os
+import threading
+from time import perf_counter
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+import numpy as np
+
+from model_loader import load_model_safely
+
+# ============================================================================
+# MODEL REGISTRY - lazily loaded, hot-reloadable models
+# ============================================================================
+#
+# main.py used to load every entry of MODELS at import time, and refused to
+# start if "letters" failed. ModelRegistry takes its place as LOADED_MODELS:
+# it reads like the old {name: {"model", "label_names", "n_features",
+# "description"}} dict, but a model is only loaded when something looks it up,
+# once, under a per-model lock so concurrent sessions wait for one load.
+#
+# A model that fails to load reads as missing (like before) and is retried on
+# the next lookup, e.g. after its file has been fixed.
+#
+# warmup() loads a model and pushes a few dummy batches through
+# predict_proba, so the first learner doesn't pay for cold caches. With
+# loader=load_model_metadata (the API process under ASL_EXECUTOR=process)
+# entries carry no model, only its label names, feature count and version.
+#
+# Every loaded model carries a "version" - its file's size and mtime, so
+# the API process and the worker processes agree on it without talking.
+# reload() loads the current file into a new entry, warms it and then
+# swaps it in with one assignment; lookups never see a half-loaded model.
+# Sessions keep the entry they started with until their feature window is
+# done (see _follow_model_reload in asl_sessions.py), so a rollout doesn't
+# disconnect anyone or mix two models' predictions in one smoothing window.
+# The replaced entry's model is closed after the swap (stopping its
+# BatchedPredictor thread). same_classes=True refuses a new version with a
+# different class count, for executors whose sessions can't follow one.
+#
+#   ASL_PRELOAD_MODELS  comma-separated models to load and warm at startup,
+#                       "all" for every configured model (default: none)
+
+WARMUP_BATCH_SIZES = (1, 8, 64)
+WARMUP_ROUNDS = 3
+
+
+class ModelRegistry:
+    """Lazily loaded models, looked up like the old LOADED_MODELS dict"""
+
+    def __init__(self, models_config: Dict[str, Dict[str, Any]],
+                 wrap: Optional[Callable[[Any], Any]] = None,
+                 loader: Callable[..., Tuple[Any, list, int]] = load_model_safely):
+        self.models_config = models_config
+        self.wrap = wrap          # applied to each model after loading (e.g. BatchedPredictor)
+        self.loader = loader      # load_model_metadata keeps no model (worker processes predict)
+        self._loaded: Dict[str, Dict[str, Any]] = {}
+        self._locks = {name: threading.Lock() for name in models_config}
+
+    # ---- dict-style access ----
+
+    def get(self, name: str, default=None) -> Optional[Dict[str, Any]]:
+        """Model info for `name`, loading it first if needed (default if unknown or failing)"""
+        info = self._loaded.get(name)
+        if info is not None:
+            return info
+        if name not in self.models_config:
+            return default
+        with self._locks[name]:
+            if name not in self._loaded:
+                info = self._load(name)
+                if info is not None:
+                    self._loaded[name] = info
+        return self._loaded.get(name, default)
+
+    def __getitem__(self, name: str) -> Dict[str, Any]:
+        info = self.get(name)
+        if info is None:
+            raise KeyError(name)
+        return info
+
+    def __contains__(self, name: str) -> bool:
+        """Configured and loadable (loads it)"""
+        return self.get(name) is not None
+
+    def is_loaded(self, name: str) -> bool:
+        return name in self._loaded
+
+    def items(self) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """Already loaded models only - iterating doesn't trigger loads"""
+        return iter(list(self._loaded.items()))
+
+    def values(self) -> Iterator[Dict[str, Any]]:
+        return iter(list(self._loaded.values()))
+
+    # ---- loading ----
+
+    def _load(self, name: str) -> Optional[Dict[str, Any]]:
+        config = self.models_config[name]
+        t0 = perf_counter()
+        try:
+            version = model_version(config["path"])
+            model, label_names, n_features = self.loader(
+                config["path"],
+                labels_path=config.get("labels_path")
+            )
+        except Exception as e:
+            print(f"✗ Failed to load model '{name}': {e}")
+            return None
+        if self.wrap is not None and model is not None:
+            model = self.wrap(model)
+        print(f"✓ Loaded model '{name}' ({version}): {len(label_names)} classes, {n_features} features")
+        print(f"  Classes: {', '.join(label_names[:10])}{'...' if len(label_names) > 10 else ''}")
+        return {
+            "model": model,
+            "label_names": label_names,
+            "n_features": n_features,
+            "description": config["description"],
+            "version": version,
+            "load_s": perf_counter() - t0,
+        }
+
+    def reload(self, name: str, same_classes: bool = False) -> Dict[str, Any]:
+        """Load the model file again if it changed, warm it up and swap it in (blocking)
+
+        Raises OSError if the model file is gone, RuntimeError if it doesn't
+        load, and ValueError if same_classes is set and the class count changed.
+        """
+        if name not in self.models_config:
+            raise KeyError(name)
+        with self._locks[name]:
+            current = self._loaded.get(name)
+            previous = current["version"] if current is not None else None
+            if previous is not None and previous == model_version(self.models_config[name]["path"]):
+                return {"model": name, "version": previous, "previous": previous, "reloaded": False}
+            info = self._load(name)
+            if info is None:
+                raise RuntimeError(f"Model '{name}' failed to load")
+            if same_classes and current is not None and len(info["label_names"]) != len(current["label_names"]):
+                _close_model(info["model"])
+                raise ValueError(
+                    f"Model '{name}' now has {len(info['label_names'])} classes "
+                    f"instead of {len(current['label_names'])}"
+                )
+            self._warm_predict(info)
+            self._loaded[name] = info    # new sessions get it now, running ones after their window
+            if current is not None:
+                # Sessions still pinned to the old entry fall back to direct predict_proba calls
+                _close_model(current["model"])
+        return {"model": name, "version": info["version"], "previous": previous, "reloaded": True}
+
+    def warmup(self, name: str) -> Dict[str, Any]:
+        """Load `name` and run dummy batches through predict_proba; returns timings"""
+        info = self.get(name)
+        if info is None:
+            raise KeyError(name)
+        return {"load_s": round(info["load_s"], 3), "predict_proba_ms": self._warm_predict(info)}
+
+    def close(self):
+        """Stop what wrap() started for every loaded model (e.g. BatchedPredictor threads)"""
+        for info in self.values():
+            _close_model(info["model"])
+
+    def _warm_predict(self, info: Dict[str, Any]) -> Dict[str, float]:
+        model = getattr(info["model"], "model", info["model"])   # skip BatchedPredictor
+        if model is None:
+            return {}
+        rng = np.random.default_rng(0)
+        predict_ms = {}
+        for batch in WARMUP_BATCH_SIZES:
+            X = rng.random((batch, info["n_features"]), dtype=np.float32)
+            times = []
+            for _ in range(WARMUP_ROUNDS):
+                t0 = perf_counter()
+                model.predict_proba(X)
+                times.append(perf_counter() - t0)
+            predict_ms[str(batch)] = round(min(times) * 1000.0, 3)
+        return predict_ms
+
+
+def _close_model(model):
+    close = getattr(model, "close", None)
+    if callable(close):
+        close()
+
+
+def model_version(model_path: str) -> str:
+    """Identifies one version of a model file (size and mtime)"""
+    st = os.stat(model_path)
+    return f"{st.st_size}-{st.st_mtime_ns}"
+
+
+def preload_names(models_config: Dict[str, Any], value: str) -> list:
+    """Model names selected by an ASL_PRELOAD_MODELS value"""
+    if value.strip().lower() == "all":
+        return list(models_config)
+    return [n.strip() for n in value.split(",") if n.strip() in models_config]
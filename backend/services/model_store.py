@@ -0,0 +1,114 @@
+import json
+import os
+import shutil
+import tempfile
+from typing import Optional
+
+import numpy as np
+
+from forest_engine import CompiledForest, savable_classes
+
+# ============================================================================
+# MODEL STORE - compiled forests as memory-mapped arrays, shared per node
+# ============================================================================
+#
+# Every uvicorn worker (and every ASL_EXECUTOR=process worker) runs
+# load_models at startup, so each one used to unpickle both forests and keep
+# its own copy of every tree. Now the first process to load a model writes
+# its CompiledForest arrays as plain .npy files into a per-node store, and
+# every process maps them read-only with np.load(mmap_mode="r"): the pages
+# live once in the OS page cache no matter how many workers there are, and
+# a later start maps the arrays instead of unpickling anything.
+#
+# One directory per model file version, named after the file's name, size
+# and mtime, so replacing a .p file just builds a new entry (older entries
+# for the same file are removed). A store is built in a temporary directory
+# and renamed into place, so workers starting together never see half of one.
+#
+#   ASL_MODEL_STORE      "1" (default) map forests from the store, "0" keep
+#                        a private copy per process (only with the compiled engine)
+#   ASL_MODEL_STORE_DIR  where stores live (default <tmp>/openhand-model-store)
+
+ARRAYS = ("feature", "threshold", "children", "value", "roots", "classes")
+
+
+def store_enabled() -> bool:
+    return os.environ.get("ASL_MODEL_STORE", "1") != "0"
+
+
+def store_root() -> str:
+    return os.environ.get("ASL_MODEL_STORE_DIR") or os.path.join(tempfile.gettempdir(), "openhand-model-store")
+
+
+def store_path(model_path: str) -> str:
+    """Store directory for the current version of a model file"""
+    st = os.stat(model_path)
+    name = os.path.basename(model_path)
+    return os.path.join(store_root(), f"{name}-{st.st_size}-{st.st_mtime_ns}")
+
+
+def open_store(model_path: str) -> Optional[CompiledForest]:
+    """Map the stored forest for this model file, or None if it hasn't been stored yet"""
+    path = store_path(model_path)
+    meta_path = os.path.join(path, "meta.json")
+    if not os.path.exists(meta_path):
+        return None
+    with open(meta_path, "r", encoding="utf-8") as f:
+        meta = json.load(f)
+    # asarray drops the np.memmap subclass (no copy), so indexing returns plain arrays
+    arrays = {k: np.asarray(np.load(os.path.join(path, f"{k}.npy"), mmap_mode="r")) for k in ARRAYS}
+    return CompiledForest(
+        feature=arrays["feature"],
+        threshold=arrays["threshold"],
+        children=arrays["children"],
+        value=arrays["value"],
+        roots=arrays["roots"],
+        max_depth=meta["max_depth"],
+        classes=arrays["classes"],
+        n_features_in=meta["n_features_in"],
+        meta_classes=meta["meta_classes"],
+    )
+
+
+def write_store(model_path: str, forest: CompiledForest) -> CompiledForest:
+    """Store `forest` for this model file and return the mapped copy"""
+    path = store_path(model_path)
+    root = os.path.dirname(path)
+    os.makedirs(root, exist_ok=True)
+
+    tmp = tempfile.mkdtemp(prefix=".building-", dir=root)
+    try:
+        for key in ARRAYS:
+            value = getattr(forest, "classes_" if key == "classes" else key)
+            if key in ("feature", "children", "roots"):
+                value = np.asarray(value, dtype=np.intp)
+            elif key == "classes":
+                value = savable_classes(value)
+            np.save(os.path.join(tmp, f"{key}.npy"), value, allow_pickle=False)
+        with open(os.path.join(tmp, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump({
+                "max_depth": forest.max_depth,
+                "n_features_in": forest.n_features_in_,
+                "meta_classes": forest.meta_classes,
+            }, f)
+        try:
+            os.rename(tmp, path)
+        except OSError:
+            # Another worker stored the same version first - use theirs
+            if not os.path.exists(os.path.join(path, "meta.json")):
+                raise
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    _remove_old_versions(model_path, keep=path)
+    return open_store(model_path)
+
+
+def _remove_old_versions(model_path: str, keep: str):
+    """Drop stores of earlier versions of this model file (mapped copies stay valid)"""
+    root = os.path.dirname(keep)
+    prefix = os.path.basename(model_path) + "-"
+    for name in os.listdir(root):
+        path = os.path.join(root, name)
+        if name.startswith(prefix) and path != keep and name[len(prefix):].replace("-", "").isdigit():
+            shutil.rmtree(path, ignore_errors=True)
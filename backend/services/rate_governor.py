@@ -0,0 +1,107 @@
+import os
+from typing import Any, Dict, Optional
+
+# ============================================================================
+# RATE GOVERNOR - adaptive per-session frame rate and JPEG quality
+# ============================================================================
+#
+# ws_endpoint used to drop any frame that arrived within 100 ms of the last
+# one, so the client kept encoding and uploading frames we then threw away.
+# Now each session tracks how long its frames take on the executor
+# (queueing included) and how many sessions share this node's workers, and
+# tells the client what to send:
+#
+#   target_fps    frames per second the client should capture and upload
+#   jpeg_quality  toBlob quality (0-1); lower when we're busy so decode and
+#                 upload get cheaper too
+#
+# Both go out in the hello message and in every reply. The server still
+# drops frames arriving well ahead of target_fps, for clients that ignore it.
+#
+#   ASL_MIN_FPS  lower bound for target_fps (default 3)
+#   ASL_MAX_FPS  upper bound for target_fps (default 10, the old fixed rate)
+
+MIN_FPS = float(os.environ.get("ASL_MIN_FPS", "3"))
+MAX_FPS = float(os.environ.get("ASL_MAX_FPS", "10"))
+MIN_JPEG_QUALITY = 0.4
+MAX_JPEG_QUALITY = 0.6   # what the web client always used
+
+
+class NodeLoad:
+    """Sessions sharing this process's frame workers"""
+
+    def __init__(self, capacity: int):
+        self.capacity = max(1, capacity)
+        self.sessions = 0
+
+    def share(self) -> float:
+        """Fraction of a worker each session can count on (1.0 when not oversubscribed)"""
+        return min(1.0, self.capacity / max(1, self.sessions))
+
+
+class RateGovernor:
+    """Per-session frame admission plus the target_fps / jpeg_quality sent to the client"""
+
+    HEADROOM = 0.8          # aim below the measured limit so queues can drain
+    EWMA_ALPHA = 0.2        # weight of the newest latency sample
+    ADJUST_EVERY_S = 0.5
+    RAISE_STEP_FPS = 1.0    # speed up gradually, slow down at once
+    DROP_SLACK = 0.8        # admit frames up to 25% early (client timer jitter)
+
+    def __init__(self, node: NodeLoad, min_fps: Optional[float] = None, max_fps: Optional[float] = None):
+        self.node = node
+        # Module limits read per session, so a benchmark can pin them after import
+        self.min_fps = MIN_FPS if min_fps is None else min_fps
+        self.max_fps = MAX_FPS if max_fps is None else max_fps
+        self.target_fps = self.max_fps
+        self.latency: Optional[float] = None
+        self.last_admit = float("-inf")
+        self.last_adjust = 0.0
+        self.dropped = 0
+        self._closed = False
+        node.sessions += 1
+
+    def admit(self, now: float) -> bool:
+        """Whether to process a frame arriving at `now`"""
+        if now - self.last_admit < self.DROP_SLACK / self.target_fps:
+            self.dropped += 1
+            return False
+        self.last_admit = now
+        return True
+
+    def record(self, latency_s: float, now: float):
+        """Feed back how long one frame took on the executor"""
+        if self.latency is None:
+            self.latency = latency_s
+        else:
+            self.latency += self.EWMA_ALPHA * (latency_s - self.latency)
+        if now - self.last_adjust >= self.ADJUST_EVERY_S:
+            self.last_adjust = now
+            self._adjust()
+
+    def _adjust(self):
+        # One frame at a time per session: 1 / latency fps at best, scaled by
+        # our share of the workers when more sessions than workers are active
+        limit = self.HEADROOM * self.node.share() / max(self.latency, 1e-3)
+        limit = min(self.max_fps, max(self.min_fps, limit))
+        if limit < self.target_fps:
+            self.target_fps = limit
+        else:
+            self.target_fps = min(limit, self.target_fps + self.RAISE_STEP_FPS)
+
+    def jpeg_quality(self) -> float:
+        span = self.max_fps - self.min_fps
+        frac = 1.0 if span <= 0 else (self.target_fps - self.min_fps) / span
+        return MIN_JPEG_QUALITY + (MAX_JPEG_QUALITY - MIN_JPEG_QUALITY) * frac
+
+    def advice(self) -> Dict[str, Any]:
+        """Fields merged into the hello message and every reply"""
+        return {
+            "target_fps": round(self.target_fps, 1),
+            "jpeg_quality": round(self.jpeg_quality(), 2),
+        }
+
+    def close(self):
+        if not self._closed:
+            self._closed = True
+            self.node.sessions -= 1
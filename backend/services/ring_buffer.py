@@ -0,0 +1,75 @@
+import numpy as np
+from typing import Optional
+
+# ============================================================================
+# RING BUFFER - fixed-capacity history of equal-length rows
+# ============================================================================
+#
+# Replaces deque-of-arrays histories (feat84_buffer, proba_buffer). Rows live
+# in one preallocated array, so appending doesn't allocate and reading the
+# window doesn't need list(...) + np.stack(...).
+#
+# Every row is written twice, at i and i + capacity, so the rows
+# oldest -> newest are always one contiguous slice and window() can return a
+# view instead of a copy.
+
+
+class RingBuffer:
+    """Fixed-capacity FIFO of rows with a zero-copy ordered window"""
+
+    def __init__(self, capacity: int, dim: Optional[int] = None, dtype=np.float32):
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        self.capacity = capacity
+        self.dtype = np.dtype(dtype)
+        self._data = None
+        self._head = 0      # index of the oldest row
+        self._count = 0
+        if dim is not None:
+            self._allocate(dim)
+
+    def _allocate(self, dim: int):
+        self._data = np.zeros((2 * self.capacity, dim), dtype=self.dtype)
+
+    @property
+    def dim(self) -> Optional[int]:
+        return None if self._data is None else self._data.shape[1]
+
+    def __len__(self) -> int:
+        return self._count
+
+    def clear(self):
+        self._head = 0
+        self._count = 0
+
+    def append(self, row):
+        """Add a row, dropping the oldest one when full (like deque(maxlen=...))"""
+        if self._data is None:
+            # Width not known up front (e.g. number of classes) - size on first use
+            self._allocate(np.shape(row)[-1])
+        if self._count == self.capacity:
+            self._head = (self._head + 1) % self.capacity
+            self._count -= 1
+        i = (self._head + self._count) % self.capacity
+        self._data[i] = row
+        self._data[i + self.capacity] = row
+        self._count += 1
+
+    def window(self) -> np.ndarray:
+        """Rows oldest -> newest as a (len, dim) view - don't keep it across appends"""
+        if self._data is None:
+            return np.zeros((0, 0), dtype=self.dtype)
+        return self._data[self._head:self._head + self._count]
+
+    def ordered(self) -> np.ndarray:
+        """Rows oldest -> newest as an independent copy"""
+        return self.window().copy()
+
+    def first(self) -> np.ndarray:
+        return self._data[self._head]
+
+    def last(self) -> np.ndarray:
+        return self._data[self._head + self._count - 1]
+
+    def __getitem__(self, i):
+        return self.window()[i]
@@ -0,0 +1,145 @@
+import os
+from time import perf_counter
+from typing import Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from landmarks import handedness_from_results, landmarks_from_results
+
+# ============================================================================
+# HAND ROI TRACKER - run MediaPipe on a crop around last frame's hands
+# ============================================================================
+#
+# Sessions used to color-convert and feed the whole decoded frame to
+# Hands.process every time, although the hands usually cover a small part
+# of a webcam frame. Once hands are found, the next frame is cropped to a
+# padded square around them and only that crop is converted and processed.
+# Landmarks are mapped back to full-frame normalized coordinates, so the
+# feature code works in the same coordinate system - but they come from a
+# different (smaller, resized) image, so they are close to, not identical
+# with, what a full-frame pass would return.
+#
+# Hands (static_image_mode=False) keeps its tracking ROI in the coordinates
+# of the previous image it was given. Whenever the image geometry changes -
+# the crop moves or resizes, a switch between crop and full frame, or the
+# full-frame fallback within one frame - the graph is reset() first, so it
+# starts from palm detection instead of a misaligned prior.
+#
+# The crop stays put while the hands stay comfortably inside it (so
+# MediaPipe's own tracking sees a steady image and keeps working), and is
+# rebuilt when they drift towards an edge. If the crop finds no hands, the
+# same frame is processed again at full size, and every FULL_FRAME_EVERY
+# frames a full frame pass picks up hands that entered outside the crop.
+#
+#   ASL_HAND_ROI  "1" (default) crop around tracked hands, "0" always full frame
+
+
+def roi_enabled() -> bool:
+    return os.environ.get("ASL_HAND_ROI", "1") != "0"
+
+
+def run_hands(hands, image: np.ndarray, timings: Dict[str, float]):
+    """cvtColor + Hands.process on a BGR image: (landmarks, labels, scores), timings accumulated"""
+    t0 = perf_counter()
+    rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+    t1 = perf_counter()
+    results = hands.process(rgb)
+    t2 = perf_counter()
+    timings["cvtcolor"] = timings.get("cvtcolor", 0.0) + (t1 - t0)
+    timings["hands_process"] = timings.get("hands_process", 0.0) + (t2 - t1)
+    labels, scores = handedness_from_results(results)
+    return landmarks_from_results(results), labels, scores
+
+
+class HandRoiTracker:
+    """Chooses the image region each Hands.process call sees"""
+
+    PAD = 0.5                # padding on each side, as a fraction of the hands' box size
+    EDGE_MARGIN = 0.1        # rebuild once hands come this close (fraction of crop) to an edge
+    MIN_SIDE_PX = 128
+    MAX_AREA_FRACTION = 0.6  # bigger crops aren't worth it - use the full frame
+    FULL_FRAME_EVERY = 30
+
+    def __init__(self):
+        self.roi: Optional[Tuple[int, int, int, int]] = None   # x0, y0, x1, y1 in pixels
+        self.frames_since_full = 0
+        self.crop_hits = 0
+        self.full_frames = 0
+        self.graph_resets = 0
+        self._geometry = None    # (roi or None, frame shape) of the last image Hands saw
+
+    def reset(self):
+        self.roi = None
+        self.frames_since_full = 0
+        self._geometry = None
+
+    def _run(self, hands, frame: np.ndarray, roi: Optional[Tuple[int, int, int, int]],
+             timings: Dict[str, float]):
+        """run_hands on the crop (or full frame), resetting Hands' tracking if the geometry changed"""
+        geometry = (roi, frame.shape[:2])
+        if self._geometry is not None and geometry != self._geometry:
+            # Its tracked hand ROI is in the previous image's coordinates
+            hands.reset()
+            self.graph_resets += 1
+        self._geometry = geometry
+        if roi is None:
+            return run_hands(hands, frame, timings)
+        x0, y0, x1, y1 = roi
+        return run_hands(hands, frame[y0:y1, x0:x1], timings)
+
+    def detect(self, hands, frame: np.ndarray, timings: Optional[Dict[str, float]] = None
+               ) -> Tuple[Optional[np.ndarray], Optional[List[str]], Optional[np.ndarray]]:
+        """Run `hands` on the frame (or a crop of it): (landmarks (H,21,3), labels, scores)"""
+        if timings is None:
+            timings = {}
+        h, w = frame.shape[:2]
+        landmarks = labels = scores = None
+
+        roi = self.roi if self.frames_since_full < self.FULL_FRAME_EVERY else None
+        if roi is not None:
+            x0, y0, x1, y1 = roi
+            landmarks, labels, scores = self._run(hands, frame, roi, timings)
+            if landmarks is not None:
+                # Crop-normalized -> frame-normalized (z shares x's scale)
+                cw, ch = x1 - x0, y1 - y0
+                landmarks[:, :, 0] = (landmarks[:, :, 0] * cw + x0) / w
+                landmarks[:, :, 1] = (landmarks[:, :, 1] * ch + y0) / h
+                landmarks[:, :, 2] *= cw / w
+                self.frames_since_full += 1
+                self.crop_hits += 1
+
+        if landmarks is None:
+            # Nothing tracked yet, tracking lost, or time for a full frame pass
+            landmarks, labels, scores = self._run(hands, frame, None, timings)
+            self.frames_since_full = 0
+            self.full_frames += 1
+
+        self._update_roi(landmarks, w, h)
+        return landmarks, labels, scores
+
+    def _update_roi(self, landmarks: Optional[np.ndarray], w: int, h: int):
+        if landmarks is None:
+            self.roi = None
+            return
+
+        xs = landmarks[:, :, 0] * w
+        ys = landmarks[:, :, 1] * h
+        bx0, bx1, by0, by1 = xs.min(), xs.max(), ys.min(), ys.max()
+
+        if self.roi is not None:
+            x0, y0, x1, y1 = self.roi
+            mx, my = self.EDGE_MARGIN * (x1 - x0), self.EDGE_MARGIN * (y1 - y0)
+            if bx0 >= x0 + mx and bx1 <= x1 - mx and by0 >= y0 + my and by1 <= y1 - my:
+                return  # still well inside - keep the crop steady
+
+        side = max(bx1 - bx0, by1 - by0) * (1.0 + 2.0 * self.PAD)
+        side = min(max(side, self.MIN_SIDE_PX), w, h)
+        if side * side > self.MAX_AREA_FRACTION * w * h:
+            self.roi = None
+            return
+
+        cx, cy = (bx0 + bx1) / 2.0, (by0 + by1) / 2.0
+        x0 = int(round(min(max(cx - side / 2.0, 0), w - side)))
+        y0 = int(round(min(max(cy - side / 2.0, 0), h - side)))
+        self.roi = (x0, y0, x0 + int(side), y0 + int(side))
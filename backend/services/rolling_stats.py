@@ -0,0 +1,187 @@
+import numpy as np
+from ring_buffer import RingBuffer
+
+# ============================================================================
+# ROLLING WINDOW STATISTICS - O(1) per frame 336-D features
+# ============================================================================
+#
+# Both session types build their 336-D vector from the last SEQ_WINDOW 84-D
+# frames (mean, std, and diff based stats). Re-stacking the window and
+# reducing 30x84 values on every frame is wasted work: each new frame only
+# adds one row and drops one. This keeps running sums that are updated as
+# rows enter and leave the window.
+#
+# Frames are stored as float32 (what the 84-D features already are), the
+# sums in float64, shifted by a reference frame so that
+# sum(x^2) - sum(x)^2 doesn't cancel badly for near-static hands. They are
+# recomputed from the stored window every RESYNC_EVERY appends so add/remove
+# rounding can't drift.
+
+
+class RollingWindowStats:
+    """Fixed-size window of frames with running mean/std/diff statistics"""
+
+    RESYNC_EVERY = 1024
+
+    def __init__(self, capacity: int, dim: int):
+        if capacity < 2:
+            raise ValueError("capacity must be at least 2")
+        self.capacity = capacity
+        self.dim = dim
+        self._frames = RingBuffer(capacity, dim, dtype=np.float32)
+        self._shift = np.zeros(dim, dtype=np.float64)
+        self._sum = np.zeros(dim, dtype=np.float64)        # sum(x - shift)
+        self._sum_sq = np.zeros(dim, dtype=np.float64)     # sum((x - shift)^2)
+        self._diff_abs = np.zeros(dim, dtype=np.float64)   # sum |x[t] - x[t-1]|
+        self._diff_sq = np.zeros(dim, dtype=np.float64)    # sum (x[t] - x[t-1])^2
+        self._since_resync = 0
+
+    def __len__(self) -> int:
+        return len(self._frames)
+
+    def clear(self):
+        self._frames.clear()
+        self._since_resync = 0
+        for acc in (self._sum, self._sum_sq, self._diff_abs, self._diff_sq):
+            acc.fill(0.0)
+
+    def append(self, x: np.ndarray):
+        # The sums track the stored (float32) values exactly
+        x = np.asarray(x, dtype=np.float32).astype(np.float64)
+        frames = self._frames
+
+        if len(frames) == 0:
+            self._shift[:] = x
+        else:
+            d = x - frames.last()
+            self._diff_abs += np.abs(d)
+            self._diff_sq += d * d
+
+        if len(frames) == self.capacity:
+            # The ring drops the oldest frame on append - take it out of the sums first
+            oldest = frames[0]
+            o = oldest - self._shift
+            self._sum -= o
+            self._sum_sq -= o * o
+            d = np.subtract(frames[1], oldest, dtype=np.float64)
+            self._diff_abs -= np.abs(d)
+            self._diff_sq -= d * d
+
+        frames.append(x)
+        s = x - self._shift
+        self._sum += s
+        self._sum_sq += s * s
+
+        self._since_resync += 1
+        if self._since_resync >= self.RESYNC_EVERY:
+            self._resync()
+
+    def _resync(self):
+        """Recompute every sum from the stored frames"""
+        M = self.window().astype(np.float64)
+        self._shift[:] = M[0]
+        S = M - self._shift
+        self._sum[:] = S.sum(axis=0)
+        self._sum_sq[:] = (S * S).sum(axis=0)
+        D = np.diff(M, axis=0)
+        self._diff_abs[:] = np.abs(D).sum(axis=0)
+        self._diff_sq[:] = (D * D).sum(axis=0)
+        self._since_resync = 0
+
+    def window(self) -> np.ndarray:
+        """Frames oldest -> newest as a (len, dim) view"""
+        return self._frames.window()
+
+    def first(self) -> np.ndarray:
+        return self._frames.first()
+
+    def last(self) -> np.ndarray:
+        return self._frames.last()
+
+    # ---- statistics over the current window (requires len >= 1) ----
+
+    def mean(self) -> np.ndarray:
+        return self._shift + self._sum / len(self)
+
+    def std(self) -> np.ndarray:
+        T = len(self)
+        m = self._sum / T
+        return np.sqrt(np.maximum(self._sum_sq / T - m * m, 0.0))
+
+    def last_minus_first(self) -> np.ndarray:
+        if len(self) < 2:
+            return np.zeros(self.dim, dtype=np.float64)
+        return np.subtract(self.last(), self.first(), dtype=np.float64)
+
+    def mean_abs_diff(self) -> np.ndarray:
+        """mean(|diff(window)|, axis=0)"""
+        T = len(self)
+        if T < 2:
+            return np.zeros(self.dim, dtype=np.float64)
+        return self._diff_abs / (T - 1)
+
+    def diff_mean(self) -> np.ndarray:
+        """mean(diff(window), axis=0) - telescopes to (last - first) / (T - 1)"""
+        T = len(self)
+        if T < 2:
+            return np.zeros(self.dim, dtype=np.float64)
+        return self.last_minus_first() / (T - 1)
+
+    def diff_std(self) -> np.ndarray:
+        """std(diff(window), axis=0)"""
+        T = len(self)
+        if T < 2:
+            return np.zeros(self.dim, dtype=np.float64)
+        m = self.diff_mean()
+        return np.sqrt(np.maximum(self._diff_sq / (T - 1) - m * m, 0.0))
+
+
+class RollingMean:
+    """Fixed-size window of rows with a running mean (width set by the first row)
+
+    Used for the smoothed class probabilities shown to the learner: append
+    adds the new row and subtracts the evicted one instead of averaging the
+    whole window on every reply.
+    """
+
+    RESYNC_EVERY = 256
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._rows = RingBuffer(capacity, dtype=np.float64)
+        self._sum = None
+        self._since_resync = 0
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def clear(self):
+        self._rows.clear()
+        self._since_resync = 0
+        if self._sum is not None:
+            self._sum.fill(0.0)
+
+    def append(self, row: np.ndarray):
+        row = np.asarray(row, dtype=np.float64)
+        rows = self._rows
+        if self._sum is None or (len(rows) == 0 and self._sum.shape[0] != row.shape[-1]):
+            # First row, or a reloaded model with a different number of classes
+            self._rows = rows = RingBuffer(self.capacity, row.shape[-1], dtype=np.float64)
+            self._sum = np.zeros(row.shape[-1], dtype=np.float64)
+        if len(rows) == self.capacity:
+            self._sum -= rows[0]
+        rows.append(row)
+        self._sum += row
+
+        self._since_resync += 1
+        if self._since_resync >= self.RESYNC_EVERY:
+            self._sum[:] = rows.window().sum(axis=0)
+            self._since_resync = 0
+
+    def window(self) -> np.ndarray:
+        """Rows oldest -> newest as a (len, dim) view"""
+        return self._rows.window()
+
+    def mean(self) -> np.ndarray:
+        """Mean of the window (requires len >= 1)"""
+        return self._sum / len(self._rows)
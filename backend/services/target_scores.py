@@ -0,0 +1,96 @@
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from rolling_stats import RollingMean
+
+# ============================================================================
+# TARGET SETS - score many lesson targets from one predict_proba per frame
+# ============================================================================
+#
+# set_target constrains a session to a single class (everything else is
+# zeroed), so a quiz or the daily challenge that accepts any of several
+# signs used to need one session per candidate. A TargetSet instead keeps,
+# for every target at once:
+#
+#   score      running mean of the target's raw probability over the same
+#              smoothing window as the session's proba_buffer (not
+#              renormalized - like set_target, it is confidence vs. "others")
+#   threshold  the class threshold (session.get_confidence_threshold)
+#   run        consecutive predictions with score >= threshold
+#   passed     run >= the session's STABLE_N
+#
+# Each update is one fancy-index into the frame's probability vector plus a
+# few vector ops over the targets, so checking ten signs costs about the
+# same as checking one. Targets the model doesn't know always score 0.
+
+
+class TargetSet:
+    """Running scores, stability runs and pass flags for a list of target classes"""
+
+    def __init__(self, smooth: int, threshold_for: Callable[[str], float], stable_n: int):
+        self.threshold_for = threshold_for
+        self.stable_n = stable_n
+        self.names: List[str] = []
+        self._labels: Optional[Sequence[str]] = None
+        self._idx = np.zeros(0, dtype=np.intp)       # class index per target
+        self._known = np.zeros(0, dtype=bool)        # target is one of the model's classes
+        self._thresholds = np.zeros(0, dtype=np.float64)
+        self._scores = RollingMean(smooth)
+        self._runs = np.zeros(0, dtype=np.int64)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def set(self, targets: Optional[Sequence[str]]):
+        """Replace the targets (None or empty clears them); matched case-insensitively"""
+        names = []
+        for t in targets or ():
+            t = str(t).strip().upper()
+            if t and t not in names:
+                names.append(t)
+        self.names = names
+        self._labels = None    # resolved against the model's labels on the next update
+        self._thresholds = np.array([self.threshold_for(n) for n in names], dtype=np.float64)
+        self._runs = np.zeros(len(names), dtype=np.int64)
+        self._scores.clear()
+
+    def clear(self):
+        """Forget the running scores (hand lost, mode change, model reload)"""
+        self._scores.clear()
+        self._runs[:] = 0
+
+    def _resolve(self, label_names: Sequence[str]):
+        index = {name: i for i, name in enumerate(label_names)}
+        self._known = np.array([n in index for n in self.names], dtype=bool)
+        self._idx = np.array([index.get(n, 0) for n in self.names], dtype=np.intp)
+        self._labels = label_names
+
+    def update(self, proba: np.ndarray, label_names: Sequence[str]):
+        """Fold one frame's class probabilities into every target's score"""
+        if not self.names:
+            return
+        if label_names is not self._labels:
+            self._resolve(label_names)
+        self._scores.append(np.where(self._known, proba[self._idx], 0.0))
+        passing = self._scores.mean() >= self._thresholds
+        self._runs = np.where(passing, self._runs + 1, 0)
+
+    def results(self) -> List[Dict[str, Any]]:
+        """One row per target, in the order they were set"""
+        if not self.names:
+            return []
+        if len(self._scores):
+            scores = self._scores.mean()
+        else:
+            scores = np.zeros(len(self.names))
+        return [
+            {
+                "name": name,
+                "score": float(scores[i]),
+                "threshold": float(self._thresholds[i]),
+                "run": int(self._runs[i]),
+                "passed": bool(self._runs[i] >= self.stable_n),
+            }
+            for i, name in enumerate(self.names)
+        ]
@@ -0,0 +1,25 @@
+import struct
+
+import pytest
+
+from frame_protocol import (FLAG_TARGET, HEADER, KIND_IMAGE, MAGIC, PROTOCOL_VERSION,
+                            FrameProtocolError, build_binary_message, parse_binary_message)
+
+
+def test_target_round_trips():
+    kind, controls, payload = parse_binary_message(build_binary_message(b"jpeg", target="Ñ"))
+    assert kind == KIND_IMAGE
+    assert controls == {"target": "Ñ"}
+    assert bytes(payload) == b"jpeg"
+
+
+def test_invalid_utf8_target_is_a_protocol_error():
+    target = b"\xff\xfe"
+    message = HEADER.pack(MAGIC, PROTOCOL_VERSION, KIND_IMAGE, FLAG_TARGET, 0, len(target)) + target + b"jpeg"
+    with pytest.raises(FrameProtocolError, match="UTF-8"):
+        parse_binary_message(message)
+
+
+def test_short_message_is_a_protocol_error():
+    with pytest.raises(FrameProtocolError):
+        parse_binary_message(struct.pack("<2s", MAGIC))
@@ -0,0 +1,102 @@
+import asyncio
+import queue
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+import inference_workers
+from inference_workers import RemoteSessionState, ShardedWorkerPool
+
+MODELS = {"letters": {"label_names": ["A", "B"], "n_features": 336, "version": "v1"}}
+SESSION_CLS = SimpleNamespace(MIN_CONFIDENCE=0.5, STABLE_N=3, CLASS_THRESHOLDS={})
+
+
+class Responses(queue.Queue):
+    """The response queue; get() after close() ends the dispatcher like a closed pipe"""
+
+    def close(self):
+        self.put(EOFError)
+
+    def get(self, *args, **kwargs):
+        item = super().get(*args, **kwargs)
+        if item is EOFError:
+            raise EOFError
+        return item
+
+
+class AliveProcess:
+    def is_alive(self):
+        return True
+
+
+@pytest.fixture
+def pool():
+    """A pool whose single "worker" is the test: requests and replies go through plain queues"""
+    pool = ShardedWorkerPool({}, n_workers=1, frame_bytes=1024)
+    pool._requests = [queue.Queue()]
+    pool._procs = [AliveProcess()]
+    pool._responses = Responses()
+    pool._ready[0].set()
+    threading.Thread(target=pool._dispatch_responses, daemon=True).start()
+    yield pool
+    pool._responses.close()
+
+
+def next_frame(pool) -> tuple:
+    while True:
+        msg = pool._requests[0].get(timeout=5)
+        if msg[0] == "frame":
+            return msg
+
+
+async def wait_until_idle(pool, session_id):
+    for _ in range(500):
+        if not pool.busy(0, session_id):
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError("late reply never cleared the session")
+
+
+def test_timed_out_frame_is_dropped_and_its_late_reply_discarded(pool, monkeypatch):
+    monkeypatch.setattr(inference_workers, "WORKER_TIMEOUT_S", 0.05)
+    state = RemoteSessionState(pool, 0, 7, "letters", "auto", MODELS, SESSION_CLS)
+
+    async def run():
+        # No reply in time: an empty result, not an exception that ends /ws
+        assert await state.process_payload(b"frame-1") is None
+        _, session_id, seq, *_ = next_frame(pool)
+        assert (session_id, seq) == (7, 1)
+
+        # The worker may still be reading frame 1, so frame 2 isn't written or sent
+        assert await state.process_payload(b"frame-2") is None
+        assert pool._requests[0].empty()
+
+        pool._responses.put((7, 1, "ok", ("v1", [])))
+        await wait_until_idle(pool, 7)
+
+        frame_3 = asyncio.ensure_future(state.process_payload(b"frame-3"))
+        _, _, seq, *_ = await asyncio.get_running_loop().run_in_executor(None, next_frame, pool)
+        assert seq == 2
+        # A reply carrying another frame's seq must not answer this one
+        pool._responses.put((7, 1, "ok", ("v1", [])))
+        pool._responses.put((7, seq, "skip", None))
+        assert await frame_3 is None
+        assert not pool.busy(0, 7)
+
+    try:
+        asyncio.run(run())
+    finally:
+        state.close()
+
+
+def test_reply_for_an_older_seq_does_not_resolve_the_current_frame(pool):
+    async def run():
+        loop = asyncio.get_running_loop()
+        pending = asyncio.ensure_future(pool.submit(0, 3, 5, ("frame", 3, 5), timeout=5))
+        await loop.run_in_executor(None, next_frame, pool)
+        pool._responses.put((3, 4, "ok", "stale"))
+        pool._responses.put((3, 5, "ok", "fresh"))
+        assert await pending == ("ok", "fresh")
+
+    asyncio.run(run())
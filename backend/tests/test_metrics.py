@@ -0,0 +1,16 @@
+from metrics import PipelineMetrics
+
+
+def test_counter_and_gauge_values_render_exactly():
+    metrics = PipelineMetrics()
+    metrics.inc("asl_frames_processed_total", 1234567, model="letters")
+    metrics.set_gauge("asl_sessions", 0.1234567891)
+    lines = metrics.render().splitlines()
+    assert 'asl_frames_processed_total{model="letters"} 1234567' in lines
+    assert "asl_sessions 0.1234567891" in lines
+
+
+def test_non_finite_gauge_uses_prometheus_spelling():
+    metrics = PipelineMetrics()
+    metrics.set_gauge("asl_sessions", float("inf"))
+    assert "asl_sessions +Inf" in metrics.render().splitlines()
@@ -1,7 +1,14 @@
 import React, { useEffect, useRef, useState } from "react";
+import { Hands, type Options as HandsOptions } from "@mediapipe/hands";
 import { useAslWs, type AslMode, type AslModel } from "../lib/useAslWs";
 import { getPassingThreshold } from "../config/thresholds";
 
+// Same Hands settings as each model's server-side session (asl_sessions.py HANDS_CONFIG)
+const HANDS_OPTIONS: Record<AslModel, HandsOptions> = {
+    letters: { maxNumHands: 2, modelComplexity: 1, minDetectionConfidence: 0.6, minTrackingConfidence: 0.6 },
+    gestures: { maxNumHands: 2, modelComplexity: 0, minDetectionConfidence: 0.4, minTrackingConfidence: 0.4 },
+};
+
 type Props = {
     wsUrl?: string;
     fps?: number;
@@ -9,6 +16,8 @@ type Props = {
     model?: AslModel;
     target?: string | null;
     showOverlay?: boolean;
+    // Run MediaPipe Hands in the browser and send landmarks instead of JPEG frames
+    clientLandmarks?: boolean;
     onPrediction?: (result: { top: string | null; conf: number | null; hand_conf?: number | null }) => void;
 };
 
@@ -19,6 +28,7 @@ const AslWebcamSender: React.FC<Props> = ({
     model = "letters",
     target = null,
     showOverlay = true,
+    clientLandmarks = false,
     onPrediction,
 }) => {
 
@@ -33,7 +43,41 @@ const AslWebcamSender: React.FC<Props> = ({
         setCurModel(model);
     }, [model]);
 
-    const { connected, result, sendFrame, setMode, setModel, setTarget } = useAslWs(wsUrl, curMode, curModel);
+    const { connected, result, rate, sendFrameBytes, sendLandmarks, setMode, setModel, setTarget } = useAslWs(wsUrl, curMode, curModel);
+
+    // Browser-side hand detection (clientLandmarks only)
+    const handsRef = useRef<Hands | null>(null);
+    const handsBusyRef = useRef(false);
+
+    useEffect(() => {
+        if (!clientLandmarks) return;
+        const hands = new Hands({
+            locateFile: (file) => `https://cdn.jsdelivr.net/npm/@mediapipe/hands/${file}`,
+        });
+        hands.onResults((results) => {
+            const handedness = results.multiHandedness ?? [];
+            sendLandmarks((results.multiHandLandmarks ?? []).map((landmarks, i) => ({
+                landmarks,
+                label: handedness[i]?.label ?? "Right",
+                score: handedness[i]?.score ?? 1,
+            })));
+        });
+        handsRef.current = hands;
+        return () => {
+            handsRef.current = null;
+            hands.close();
+        };
+    }, [clientLandmarks, sendLandmarks]);
+
+    useEffect(() => {
+        handsRef.current?.setOptions(HANDS_OPTIONS[curModel]);
+    }, [curModel, clientLandmarks]);
+
+    // Read by the capture loop without restarting it on every reply
+    const rateRef = useRef(rate);
+    useEffect(() => {
+        rateRef.current = rate;
+    }, [rate]);
 
     // Sync hook model when curModel changes
     useEffect(() => {
@@ -97,12 +141,13 @@ const AslWebcamSender: React.FC<Props> = ({
 
     useEffect(() => {
         let raf = 0;
-        const period = 1000 / fps;
         let last = 0;
 
         const tick = (ts: number) => {
             raf = requestAnimationFrame(tick);
             if (!streamingRef.current || !connected) return;
+            // Never faster than the fps prop, slower when the server asks for it
+            const period = 1000 / Math.min(fps, rateRef.current?.targetFps ?? fps);
             if (ts - last < period) return;
             last = ts;
 
@@ -110,6 +155,19 @@ const AslWebcamSender: React.FC<Props> = ({
             const c = canvasRef.current;
             if (!v || !c) return;
 
+            const hands = handsRef.current;
+            if (hands) {
+                // Detect on the unmirrored video and send only the landmarks
+                if (handsBusyRef.current) return;
+                handsBusyRef.current = true;
+                hands.send({ image: v })
+                    .catch((err) => console.error("Hand detection failed:", err))
+                    .finally(() => {
+                        handsBusyRef.current = false;
+                    });
+                return;
+            }
+
             const ctx = c.getContext("2d");
             if (!ctx) return;
 
@@ -117,17 +175,15 @@ const AslWebcamSender: React.FC<Props> = ({
             c.height = Math.round((v.videoHeight / v.videoWidth) * 320) || 240;
             ctx.drawImage(v, 0, 0, c.width, c.height);
 
-            // encode JPEG at medium quality
-            const dataUrl = c.toDataURL("image/jpeg", 0.6);
-            const idx = dataUrl.indexOf("base64,");
-            const b64 = idx > 0 ? dataUrl.slice(idx + 7) : "";
-
-            if (b64) sendFrame(b64);
+            // encode JPEG at the server's suggested quality and send the raw bytes
+            c.toBlob((blob) => {
+                if (blob) sendFrameBytes(blob);
+            }, "image/jpeg", rateRef.current?.jpegQuality ?? 0.6);
         };
 
         raf = requestAnimationFrame(tick);
         return () => cancelAnimationFrame(raf);
-    }, [fps, connected, sendFrame]);
+    }, [fps, connected, sendFrameBytes]);
 
     return (
         <div className="w-100 d-flex flex-column align-items-center">
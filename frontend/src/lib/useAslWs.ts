@@ -4,10 +4,20 @@ import { getGestureName } from "./gestureMap";
 export type AslMode = "letters" | "numbers" | "auto";
 export type AslModel = "letters" | "gestures";
 
+// One candidate of a target set (setTargets), scored every frame by the server
+export interface AslTargetScore {
+    name: string;
+    score: number;
+    threshold: number;
+    run: number;
+    passed: boolean;
+}
+
 export interface AslResult {
     top: string | null;
     conf: number | null;
     probs: { name: string; p: number }[];
+    targets: AslTargetScore[];
     motion?: number | null;
     hand_conf?: number | null;
     n_features: number;
@@ -15,10 +25,36 @@ export interface AslResult {
     model: AslModel;
 }
 
+// Capture rate and JPEG quality the server asks for, adjusted to its load
+export interface AslRate {
+    targetFps: number;
+    jpegQuality: number;
+}
+
+// Binary frame header, see backend/services/frame_protocol.py:
+// magic "OH", version 1, kind 1 (image), no flags, mode 0, no target, reserved
+const FRAME_HEADER = new Uint8Array([0x4f, 0x48, 1, 1, 0, 0, 0, 0]);
+// Same header with kind 2 (landmarks detected on the client)
+const LANDMARKS_HEADER = new Uint8Array([0x4f, 0x48, 1, 2, 0, 0, 0, 0]);
+
+// One hand as MediaPipe Hands reports it (run on the unmirrored frame)
+export interface DetectedHand {
+    landmarks: { x: number; y: number; z: number }[];
+    label: string;
+    score: number;
+}
+
+export interface AslWsOptions {
+    // replies=delta: the server only sends fields that changed since its last
+    // message (default true); false asks for a full reply per frame
+    deltaReplies?: boolean;
+}
+
 export function useAslWs(
     wsUrl: string,
     initialMode: AslMode = "numbers",
-    initialModel: AslModel = "gestures"
+    initialModel: AslModel = "gestures",
+    { deltaReplies = true }: AslWsOptions = {}
 ) {
     const wsRef = useRef<WebSocket | null>(null);
     const reconnectTimeoutRef = useRef<number | null>(null);
@@ -28,6 +64,7 @@ export function useAslWs(
     const [model, setModelState] = useState<AslModel>(initialModel);
     const [result, setResult] = useState<AslResult | null>(null);
     const [error, setError] = useState<string | null>(null);
+    const [rate, setRate] = useState<AslRate | null>(null);
 
     const sendJson = useCallback((obj: any) => {
         const ws = wsRef.current;
@@ -59,6 +96,14 @@ export function useAslWs(
         [sendJson]
     );
 
+    // Several candidate signs at once (quizzes, daily challenge); null clears them
+    const setTargets = useCallback(
+        (targets: string[] | null) => {
+            sendJson({ targets });
+        },
+        [sendJson]
+    );
+
     useEffect(() => {
         let shouldReconnect = true;
 
@@ -67,12 +112,17 @@ export function useAslWs(
 
         const connect = () => {
             try {
-                const url = `${base}?mode=${mode}&model=${model}`;
+                const replies = deltaReplies ? "delta" : "full";
+                const url = `${base}?mode=${mode}&model=${model}&replies=${replies}`;
                 console.log("Connecting to WebSocket:", url);
 
                 const ws = new WebSocket(url);
                 wsRef.current = ws;
 
+                // Every field the server has sent on this socket (hello + deltas);
+                // full replies simply overwrite all of it
+                let latest: any = {};
+
                 ws.onopen = () => {
                     // Ignore if this socket is no longer the current one
                     if (ws !== wsRef.current) return;
@@ -109,16 +159,32 @@ export function useAslWs(
                     if (ws !== wsRef.current) return;
 
                     try {
-                        const data = JSON.parse(ev.data);
+                        const message = JSON.parse(ev.data);
 
-                        if (data.hello) {
-                            console.log("Received hello from server:", data);
+                        if (message.error) {
+                            console.error("Server error:", message.error);
+                            setError(message.error);
                             return;
                         }
 
-                        if (data.error) {
-                            console.error("Server error:", data.error);
-                            setError(data.error);
+                        const data = { ...latest, ...message };
+                        latest = data;
+
+                        if (typeof message.target_fps === "number") {
+                            const next: AslRate = {
+                                targetFps: data.target_fps,
+                                jpegQuality: data.jpeg_quality ?? 0.6,
+                            };
+                            // Only re-render when the advice actually changes
+                            setRate((prev) =>
+                                prev && prev.targetFps === next.targetFps && prev.jpegQuality === next.jpegQuality
+                                    ? prev
+                                    : next
+                            );
+                        }
+
+                        if (message.hello) {
+                            console.log("Received hello from server:", message);
                             return;
                         }
 
@@ -140,10 +206,18 @@ export function useAslWs(
                                 }))
                                 : [];
 
+                        const mappedTargets: AslTargetScore[] = Array.isArray(data.targets)
+                            ? data.targets.map((t: AslTargetScore) => ({
+                                ...t,
+                                name: currentModel === "gestures" ? getGestureName(t.name) : t.name,
+                            }))
+                            : [];
+
                         setResult({
                             top: mappedTop ?? null,
                             conf: data.conf ?? null,
                             probs: mappedProbs,
+                            targets: mappedTargets,
                             motion: data.motion ?? null,
                             hand_conf: data.hand_conf ?? null,
                             n_features: data.n_features ?? 0,
@@ -176,7 +250,7 @@ export function useAslWs(
                 wsRef.current = null;
             }
         };
-    }, [wsUrl, mode, model]);
+    }, [wsUrl, mode, model, deltaReplies]);
 
     const sendFrame = useCallback(
         (jpegBase64NoPrefix: string) => {
@@ -185,5 +259,33 @@ export function useAslWs(
         [sendJson]
     );
 
-    return { connected, result, sendFrame, mode, setMode, model, setModel, setTarget, error };
+    // Raw JPEG/WebP bytes behind a small header - no base64 or JSON on either side
+    const sendFrameBytes = useCallback((image: Blob) => {
+        const ws = wsRef.current;
+        if (ws && ws.readyState === WebSocket.OPEN) {
+            ws.send(new Blob([FRAME_HEADER, image]));
+        }
+    }, []);
+
+    // Hands detected in the browser: the server skips decode and MediaPipe.
+    // An empty list means no hand in this frame.
+    const sendLandmarks = useCallback((hands: DetectedHand[]) => {
+        const ws = wsRef.current;
+        if (!ws || ws.readyState !== WebSocket.OPEN) return;
+        const n = Math.min(hands.length, 2);
+        const body = new ArrayBuffer(4 + 4 * n * (1 + 21 * 3));
+        const bytes = new Uint8Array(body);
+        const floats = new Float32Array(body, 4);
+        bytes[0] = n;
+        for (let h = 0; h < n; h++) {
+            if (hands[h].label === "Right") bytes[1] |= 1 << h;
+            floats[h] = hands[h].score;
+            hands[h].landmarks.slice(0, 21).forEach((lm, i) => {
+                floats.set([lm.x, lm.y, lm.z], n + h * 63 + i * 3);
+            });
+        }
+        ws.send(new Blob([LANDMARKS_HEADER, body]));
+    }, []);
+
+    return { connected, result, rate, sendFrame, sendFrameBytes, sendLandmarks, mode, setMode, model, setModel, setTarget, setTargets, error };
 }